@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "users.apps.UsersConfig",
     "title.apps.TitleConfig",
     "social.apps.SocialConfig",
@@ -91,6 +92,44 @@ else:
         }
     }
 
+# deployments with more than one web or celery process set CACHE_LOCATION to a redis:// url, a per process cache
+# would miss the tag invalidations of the others, tests and local checkouts keep the in-memory cache
+if env("CACHE_LOCATION", default="") and "test" not in sys.argv:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": env("CACHE_LOCATION"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# like counts in cached chapter lists lag behind by at most this
+CHAPTER_LIST_CACHE_TIMEOUT = 60 * 5
+
+# "columnar" evaluates catalogue filters on an in-memory numpy index, requires numpy
+TITLE_FILTER_ENGINE = env("TITLE_FILTER_ENGINE", default="orm")
+
+CATALOGUE_INDEX_REFRESH_INTERVAL = 10
+
+# chapter like deltas folded into the counters per flush
+CHAPTER_LIKES_FLUSH_BATCH_SIZE = 10000
+
+# votes at the mean mark every title starts with in its ranking
+TITLE_RANKING_PRIOR_VOTES = 10
+
+# rankings are recomputed with a new prior once the mean mark of all votes moves this far from the stored one
+TITLE_RANKING_PRIOR_DRIFT = 0.01
+
+# weight of each kind of title activity in trending scores
+TRENDING_ACTIVITY_WEIGHTS = {"likes": 1, "ratings": 2, "list_adds": 3, "comments": 1}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -175,6 +214,13 @@ PASSWORD_RESET_TIMEOUT = 60 * 10  # 10 minutes
 CELERY_BROKER_URL = env("CELERY_BROKER_URL")
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
+CELERY_BEAT_SCHEDULE = {
+    "update-trending-titles": {"task": "title.tasks.update_trending_titles", "schedule": 60 * 5},
+    "compact-title-activity": {"task": "title.tasks.compact_title_activity", "schedule": 60 * 60},
+    "flush-chapter-likes": {"task": "title.tasks.flush_chapter_likes", "schedule": 5},
+    "refresh-catalogue-likes": {"task": "title.tasks.refresh_catalogue", "schedule": 60},
+    "update-title-rankings": {"task": "title.tasks.update_rankings", "schedule": 60 * 10},
+}
 
 cloudinary.config(
     cloud_name=env("CLOUD_NAME"),
@@ -188,6 +234,35 @@ ALLOWED_CHAPTER_IMAGE_EXTENSIONS = [
 
 ALLOWED_CHAPTER_IMAGE_SIZE = 1024 ** 2 * 10
 
+ALLOWED_CHAPTER_IMAGE_COMPRESSION_RATIO = 100
+
+CHAPTER_UPLOAD_WORKERS = 8
+
+CHAPTER_UPLOAD_MAX_IN_FLIGHT_BYTES = 1024 ** 2 * 64
+
+CHAPTER_UPLOAD_RETRIES = 3
+
+CHAPTER_PAGE_STORAGE = "title.storage.CloudinaryPageStorage"
+
+CHAPTER_PAGE_WIDTHS = [480, 720, 1080]
+
+CHAPTER_PAGE_QUALITY = 80
+
+# chapters of a title published by a team within this many seconds are grouped in the latest chapters feed
+CHAPTER_FEED_GROUP_WINDOW = 60 * 60 * 6
+
+# pages of the next chapter sent along with a chapter for the reader to preload
+READER_PREFETCH_PAGES = 3
+
+# levels of replies and replies per comment a comment thread shows by default and at most
+COMMENT_THREAD_LEVELS = 3
+
+COMMENT_THREAD_MAX_LEVELS = 10
+
+COMMENT_THREAD_REPLIES = 10
+
+COMMENT_THREAD_MAX_REPLIES = 100
+
 GRAPH_MODELS = {
   "all_applications": False,
   "group_models": False,
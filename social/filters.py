@@ -31,5 +31,7 @@ class CommentsFilter(django_filters.FilterSet):
         fields=(
             ("total_likes", "rating"),
             ("id", "date_added"),
+            ("wilson_score", "best"),
+            ("hot_score", "hot"),
         )
     )
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0023_subscription_social_subscription_user_title_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='hot_score',
+            field=models.FloatField(blank=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='wilson_score',
+            field=models.FloatField(blank=True, default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            sql="""
+                update social_comment
+                set wilson_score = case when likes + dislikes = 0 then 0 else (
+                        (likes + 1.9208) / (likes + dislikes)
+                        - 1.96 * sqrt(likes::float8 * dislikes / (likes + dislikes) + 0.9604) / (likes + dislikes)
+                    ) / (1 + 3.8416 / (likes + dislikes)) end,
+                    hot_score = sign(likes - dislikes) * log(greatest(abs(likes - dislikes), 1))
+                        + extract(epoch from creation_date) / 45000;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['title', 'wilson_score', 'id'], name='comment_wilson_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['title', 'hot_score', 'id'], name='comment_hot_keyset_idx'),
+        ),
+    ]
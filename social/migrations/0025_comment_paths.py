@@ -0,0 +1,45 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0024_comment_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(blank=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunSQL(
+            sql="""
+                with recursive thread as (
+                    select id, lpad(id::text, 10, '0') as path, 0 as depth
+                    from social_comment
+                    where reply_to_id is null
+                    union all
+                    select comment.id, thread.path || '/' || lpad(comment.id::text, 10, '0'), thread.depth + 1
+                    from social_comment as comment
+                    join thread on comment.reply_to_id = thread.id
+                )
+                update social_comment
+                set path = thread.path, depth = thread.depth
+                from thread
+                where social_comment.id = thread.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['path'], name='comment_path_idx', opclasses=['text_pattern_ops']),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.db.models import UniqueConstraint, Q
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
+from title.trending import record_activity
 import pgtrigger
 
 
@@ -29,6 +30,58 @@ class Friend(models.Model):
         return f"{self.user} -> {self.friend}"
 
 
+# a tenfold net score is worth as much as being this many seconds newer in the hot score
+HOT_SCORE_PERIOD = 45000
+
+# wilson lower bound of the share of likes at 95% confidence (z = 1.96) and a hot score that grows with time,
+# so neither has to be decayed later
+COMMENT_SCORES_SQL = f"""
+    new.wilson_score := case when new.likes + new.dislikes = 0 then 0 else (
+        (new.likes + 1.9208) / (new.likes + new.dislikes)
+        - 1.96 * sqrt(new.likes::float8 * new.dislikes / (new.likes + new.dislikes) + 0.9604)
+        / (new.likes + new.dislikes)
+    ) / (1 + 3.8416 / (new.likes + new.dislikes)) end;
+    new.hot_score := sign(new.likes - new.dislikes) * log(greatest(abs(new.likes - new.dislikes), 1))
+        + extract(epoch from new.creation_date) / {HOT_SCORE_PERIOD};
+"""
+
+
+# the path is the parent path and the zero padded comment id, so a thread is one prefix range in path order
+@pgtrigger.register(
+    pgtrigger.Trigger(
+        name="set_comment_path",
+        operation=pgtrigger.Insert | pgtrigger.Update,
+        when=pgtrigger.Before,
+        func=
+        """
+        if TG_OP = 'UPDATE' then
+            new.path := old.path;
+            new.depth := old.depth;
+            return new;
+        end if;
+        select path || '/', depth + 1 into new.path, new.depth from social_comment where id = new.reply_to_id;
+        new.path := coalesce(new.path, '') || lpad(new.id::text, 10, '0');
+        new.depth := coalesce(new.depth, 0);
+        return new;
+        """
+    )
+)
+@pgtrigger.register(
+    pgtrigger.Trigger(
+        name="update_comment_scores",
+        operation=pgtrigger.Insert | pgtrigger.UpdateOf("likes", "dislikes"),
+        when=pgtrigger.Before,
+        func=COMMENT_SCORES_SQL + "return new;"
+    )
+)
+@pgtrigger.register(
+    pgtrigger.Trigger(
+        name="record_title_activity_on_comment",
+        operation=pgtrigger.Insert,
+        when=pgtrigger.After,
+        func=record_activity("comments", "select new.title_id") + "return null;"
+    )
+)
 class Comment(models.Model):
     id = models.AutoField(primary_key=True)
     title = models.ForeignKey("title.Title", on_delete=models.CASCADE, blank=False, null=False)
@@ -51,6 +104,18 @@ class Comment(models.Model):
     is_deleted = models.BooleanField(default=False, blank=True, null=False)
     likes = models.PositiveIntegerField(default=0, blank=True, null=False)
     dislikes = models.PositiveIntegerField(default=0, blank=True, null=False)
+    wilson_score = models.FloatField(default=0, editable=False, blank=True, null=False)
+    hot_score = models.FloatField(default=0, editable=False, blank=True, null=False)
+    path = models.TextField(editable=False, default="", blank=True, null=False)
+    depth = models.PositiveSmallIntegerField(editable=False, default=0, blank=True, null=False)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of title comments by score
+            models.Index(fields=["title", "wilson_score", "id"], name="comment_wilson_keyset_idx"),
+            models.Index(fields=["title", "hot_score", "id"], name="comment_hot_keyset_idx"),
+            models.Index(fields=["path"], opclasses=["text_pattern_ops"], name="comment_path_idx"),
+        ]
 
     def __str__(self):
         return f"{self.id}: {self.comment[:20]}"
@@ -80,6 +145,7 @@ class Comment(models.Model):
 )
 @pgtrigger.register(
     pgtrigger.Trigger(
+        # returns old so the vote row goes with the count, null would cancel the delete
         name="update_comment_likes_on_delete",
         operation=pgtrigger.Delete,
         when=pgtrigger.Before,
@@ -94,7 +160,7 @@ class Comment(models.Model):
             set dislikes = dislikes - 1
             where id = old.comment_id;
         end if;
-        return null;
+        return old;
         """
     )
 )
@@ -203,6 +269,14 @@ class Notification(models.Model):
         """
     )
 )
+@pgtrigger.register(
+    pgtrigger.Trigger(
+        name="record_title_activity_on_list_add",
+        operation=pgtrigger.Insert,
+        when=pgtrigger.After,
+        func=record_activity("list_adds", "select new.title_id") + "return null;"
+    )
+)
 @pgtrigger.register(
     pgtrigger.Trigger(
         name="update_in_list_count_on_insert",
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.core.validators import MinLengthValidator, MaxLengthValidator
 from .models import List, Subscription, ListTitle, Friend, Notification, Comment, CommentVote
 from django.apps import apps
@@ -175,6 +176,23 @@ class CommentListSerializer(serializers.ModelSerializer):
         )
 
 
+class CommentThreadSerializer(CommentListSerializer):
+    class Meta(CommentListSerializer.Meta):
+        fields = CommentListSerializer.Meta.fields + ("reply_to", "depth")
+
+
+class CommentThreadQuerySerializer(serializers.Serializer):
+    levels = serializers.IntegerField(
+        min_value=1, max_value=settings.COMMENT_THREAD_MAX_LEVELS, default=settings.COMMENT_THREAD_LEVELS
+    )
+    replies = serializers.IntegerField(
+        min_value=1, max_value=settings.COMMENT_THREAD_MAX_REPLIES, default=settings.COMMENT_THREAD_REPLIES
+    )
+
+    class Meta:
+        fields = ("levels", "replies")
+
+
 class CommentVoteSerializer(serializers.ModelSerializer):
 
     class Meta:
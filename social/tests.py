@@ -1,6 +1,9 @@
 from django.contrib.auth import get_user_model
+from django.urls import reverse
 from rest_framework.test import APITestCase
-from .models import Friend
+from title.tests import create_title
+from .models import Friend, Comment, CommentVote
+import datetime
 
 
 # Test user views
@@ -26,3 +29,101 @@ class ModelTests(APITestCase):
             friend=user2
         )
         self.assertEqual(str(friendship), "testusername1 -> testusername2")
+
+
+class CommentScoreTests(APITestCase):
+
+    def setUp(self):
+        self.title = create_title()
+        self.users = [
+            get_user_model().objects.create_user(
+                f"user{number}@user.com", f"user{number}", datetime.date(2000, 1, 1), "userpassword"
+            )
+            for number in range(4)
+        ]
+        # one like against three likes and a dislike
+        self.lone = Comment.objects.create(title=self.title, user=self.users[0], comment="Один лайк")
+        self.popular = Comment.objects.create(title=self.title, user=self.users[0], comment="Много лайков")
+        CommentVote.objects.create(user=self.users[0], comment=self.lone, vote=True)
+        for user in self.users[:3]:
+            CommentVote.objects.create(user=user, comment=self.popular, vote=True)
+        CommentVote.objects.create(user=self.users[3], comment=self.popular, vote=False)
+
+    def comments(self, query: str) -> tuple:
+        response = self.client.get(reverse("social:titleComments", args=[self.title.id]) + query)
+        return [comment["id"] for comment in response.data["results"]], response.data.get("next")
+
+    # Scores follow votes, best and hot orders are paged by keyset
+    def test_comment_scores(self):
+        self.popular.refresh_from_db()
+        self.lone.refresh_from_db()
+        self.assertGreater(self.popular.wilson_score, self.lone.wilson_score)
+        self.assertGreater(self.popular.hot_score, self.lone.hot_score)
+
+        page, next_page = self.comments("?order=-best&cursor=&limit=1")
+        self.assertEqual(page, [self.popular.id])
+        page, next_page = self.comments(next_page[next_page.index("?"):])
+        self.assertEqual((page, next_page), ([self.lone.id], None))
+
+        # a vote changed to a dislike replaces the like
+        CommentVote.objects.create(user=self.users[0], comment=self.lone, vote=False)
+        self.lone.refresh_from_db()
+        self.assertEqual((self.lone.likes, self.lone.dislikes), (0, 1))
+        self.assertAlmostEqual(self.lone.wilson_score, 0)
+        self.assertEqual(CommentVote.objects.filter(comment=self.lone).count(), 1)
+
+    # A withdrawn vote is deleted along with its count, withdrawing it again finds nothing
+    def test_withdrawn_vote(self):
+        self.client.force_authenticate(self.users[3])
+        url = reverse("social:titleCommentsDeleteVote", args=[self.popular.id])
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.popular.refresh_from_db()
+        self.assertEqual((self.popular.likes, self.popular.dislikes), (3, 0))
+        self.assertFalse(CommentVote.objects.filter(comment=self.popular, user=self.users[3]).exists())
+        self.assertEqual(self.client.delete(url).status_code, 400)
+
+
+class CommentThreadTests(APITestCase):
+
+    def setUp(self):
+        self.title = create_title()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "user", datetime.date(2000, 1, 1), "userpassword"
+        )
+        self.root = self.reply(None)
+        self.first = self.reply(self.root)
+        self.second = self.reply(self.root)
+        self.nested = self.reply(self.first)
+        self.deepest = self.reply(self.nested)
+        self.hidden = self.reply(self.second)
+
+    def reply(self, comment):
+        return Comment.objects.create(title=self.title, user=self.user, comment="Ответ", reply_to=comment)
+
+    def thread(self, query: str) -> list:
+        response = self.client.get(reverse("social:titleCommentThread", args=[self.root.id]) + query)
+        return [(comment["id"], comment["depth"], comment["count_replies"]) for comment in response.data]
+
+    # A thread comes back in thread order with levels and replies per comment cut off
+    def test_comment_thread(self):
+        self.assertEqual(Comment.objects.get(id=self.deepest.id).depth, 3)
+        self.assertEqual(self.thread(""), [
+            (self.first.id, 1, 1), (self.nested.id, 2, 1), (self.deepest.id, 3, 0),
+            (self.second.id, 1, 1), (self.hidden.id, 2, 0),
+        ])
+        self.assertEqual(self.thread("?levels=2&replies=1"), [(self.first.id, 1, 1), (self.nested.id, 2, 1)])
+        self.assertEqual(self.client.get(
+            reverse("social:titleCommentThread", args=[self.root.id]) + "?levels=0"
+        ).status_code, 400)
+
+    # Votes of the user are overlaid with one query for the whole thread
+    def test_thread_votes(self):
+        CommentVote.objects.create(user=self.user, comment=self.nested, vote=True)
+        self.client.force_authenticate(self.user)
+        # root, thread, authors and votes
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("social:titleCommentThread", args=[self.root.id]))
+        votes = {comment["id"]: comment["vote"] for comment in response.data}
+        self.assertEqual(votes[self.nested.id], True)
+        self.assertIsNone(votes[self.first.id])
+        self.assertTrue(all(comment["is_author"] for comment in response.data))
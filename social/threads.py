@@ -0,0 +1,44 @@
+from django.db.models import Count, F, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+from .models import Comment, CommentVote
+
+
+def comment_thread(root: Comment, levels: int, replies: int) -> list:
+    # replies of root down to levels below it from one range scan of the path index, numbered per comment so only
+    # the first replies of every comment are read, the level below the deepest shown one only to count its replies
+    ranked = Comment.objects.filter(
+        path__startswith=f"{root.path}/", depth__lte=root.depth + levels + 1
+    ).annotate(
+        number=Window(expression=RowNumber(), partition_by=[F("reply_to_id")], order_by=F("path").asc()),
+        siblings=Window(expression=Count("id"), partition_by=[F("reply_to_id")])
+    )
+    sql, params = ranked.query.sql_with_params()
+    comments = Comment.objects.raw(
+        f"SELECT * FROM ({sql}) AS ranked WHERE number <= CASE WHEN depth > %s THEN 1 ELSE %s END ORDER BY path",
+        (*params, root.depth + levels, replies)
+    )
+    shown = {root.id}
+    count_replies = {}
+    thread = []
+    for comment in comments:
+        count_replies[comment.reply_to_id] = comment.siblings
+        # replies of comments cut off by their own parent aren't shown either
+        if comment.depth <= root.depth + levels and comment.reply_to_id in shown:
+            shown.add(comment.id)
+            thread.append(comment)
+    for comment in thread:
+        comment.count_replies = count_replies.get(comment.id, 0)
+    prefetch_related_objects(thread, "user")
+    return thread
+
+
+def overlay_votes(comments: list, user):
+    # votes of the user for every shown comment are read at once
+    votes = dict(
+        CommentVote.objects.filter(user=user, comment_id__in=[comment.id for comment in comments]).values_list(
+            "comment_id", "vote"
+        )
+    )
+    for comment in comments:
+        comment.vote = votes.get(comment.id)
+        comment.is_author = comment.user_id == user.id
@@ -5,7 +5,7 @@ from .views import (
     NotificationRetrieveUpdateDestroyView, CreateDefaultLists, UserListsOfTitle, CountNotifications,
     TitleCommentsList, CommentVoteCreate, CommentVoteDestroy, TitleCommentCreate, TitleCommentUpdate,
     TitleCommentsRepliesList, AcceptTeamInvite, RemoveFriendView, NotificationList, ReadAllNotifications,
-    DeleteNotifications
+    DeleteNotifications, TitleCommentThread
 )
 
 app_name = "social"
@@ -47,6 +47,7 @@ urlpatterns = [
     path("comments/", TitleCommentCreate.as_view(), name="titleCommentCreate"),
     path("comments/<int:title>/", TitleCommentsList.as_view(), name="titleComments"),
     path("comments/replies/<int:comment_id>/", TitleCommentsRepliesList.as_view(), name="titleCommentsReply"),
+    path("comments/thread/<int:comment_id>/", TitleCommentThread.as_view(), name="titleCommentThread"),
     path("comments/update/", TitleCommentUpdate.as_view(), name="titleCommentsUpdate"),
     path("comments/vote/", CommentVoteCreate.as_view(), name="titleCommentsVote"),
     path("comments/vote-delete/<int:comment_id>/", CommentVoteDestroy.as_view(), name="titleCommentsDeleteVote"),
@@ -3,23 +3,24 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from django.db import IntegrityError, transaction
-from django.db.models import (
-    F, Sum, Subquery, OuterRef, IntegerField, Q, Count, BooleanField, ExpressionWrapper, FloatField
-)
-from django.db.models.functions import Greatest, Coalesce
+from django.db.models import F, Subquery, OuterRef, IntegerField, Q, Count, BooleanField, ExpressionWrapper
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from .models import List, ListTitle, Subscription, Friend, Notification, Comment, CommentVote
 from .serializers import (
     ListSerializer, ListCreateSerializer, SubscriptionSerializer, ListTitleSerializer, ListTitleListSerializer,
     FriendRequestNotificationSerializer, NotificationSerializer, CreateDefaultListsSerializer, CommentListSerializer,
-    CommentVoteSerializer, CommentSerializer, CommentUpdateSerializer, FriendSerializer, DeleteNotificationsSerializer
+    CommentVoteSerializer, CommentSerializer, CommentUpdateSerializer, FriendSerializer, DeleteNotificationsSerializer,
+    CommentThreadSerializer, CommentThreadQuerySerializer
 )
 from django_filters import rest_framework as filters
 from .filters import ListTitleFilter, CommentsFilter
 from .tasks import notify_user_of_comment_reply
+from .threads import comment_thread, overlay_votes
 from .utils import UserDeleteWriteListTitlePermission, NotificationPermission, CommentPermission, \
     UserDeleteWritePermission
 from django.apps import apps
+from title.utils import TitlePagination
 
 Title = apps.get_model(app_label="title", model_name="Title")
 TeamParticipant = apps.get_model(app_label="title", model_name="TeamParticipant")
@@ -174,13 +175,7 @@ class ListTitlesList(generics.ListAPIView):
 
     def get_queryset(self):
         list_id = self.kwargs.get("list_id")
-        return Title.objects.filter(lists_of_title__list=list_id).annotate(
-            total_rating=Coalesce(
-                Sum(
-                    F("ratings_of_title__amount") * 1.0 * F("ratings_of_title__rating__mark")
-                ) / Greatest(Sum("ratings_of_title__amount"), 1), 0,
-                output_field=FloatField()
-            ),
+        return Title.objects.catalogue().filter(lists_of_title__list=list_id).annotate(
             added=F("lists_of_title__date_added"),
             user_rating=Coalesce(
                 Subquery(
@@ -356,14 +351,21 @@ class CommentVoteDestroy(generics.DestroyAPIView):
 
 
 class TitleCommentsList(generics.ListAPIView):
+    # best and hot orders walk the (title, score, id) indexes, ?cursor= pages them by keyset
     serializer_class = CommentListSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = CommentsFilter
+    pagination_class = TitlePagination
 
     def get_queryset(self):
         title = self.kwargs.get("title")
+        # replies are counted per shown comment instead of grouping every comment of the title
         comments = Comment.objects.filter(title=title, reply_to__isnull=True).annotate(
-            count_replies=Count("replies"),
+            count_replies=Coalesce(Subquery(
+                Comment.objects.filter(reply_to_id=OuterRef("id")).order_by().values("reply_to_id").annotate(
+                    count=Count("id")
+                ).values("count")
+            ), 0),
             total_likes=F("likes") - F("dislikes"),
         )
         if self.request.user.is_anonymous:
@@ -455,6 +457,18 @@ class TitleCommentsRepliesList(generics.ListAPIView):
             )
 
 
+class TitleCommentThread(APIView):
+    # ?levels= of replies below the comment with at most ?replies= per comment, in thread order
+    def get(self, request, *args, **kwargs):
+        query = CommentThreadQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        root = get_object_or_404(Comment.objects.only("id", "path", "depth"), id=self.kwargs.get("comment_id"))
+        thread = comment_thread(root, query.validated_data["levels"], query.validated_data["replies"])
+        if not self.request.user.is_anonymous:
+            overlay_votes(thread, self.request.user)
+        return Response(data=CommentThreadSerializer(thread, many=True).data, status=status.HTTP_200_OK)
+
+
 class AcceptTeamInvite(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (
-    Title, ReleaseFormat, Rating, TitleRating, TitlePerson, Person, Keyword, Publisher, Chapter, Team, TeamParticipant,
+    Title, ReleaseFormat, Rating, TitlePerson, Person, Keyword, Publisher, Chapter, Team, TeamParticipant,
     UserTitleRating, ChapterLikes, TitlePublisher, TitleTeam, ChapterImages
 )
 from django_better_admin_arrayfield.admin.mixins import DynamicArrayMixin
@@ -26,11 +26,13 @@ class TitleAdmin(admin.ModelAdmin, DynamicArrayMixin):
         ("Info", {"fields": (
             "description", "release_year", "poster", "chapters", "licensed", "age_rating", "title_type", "title_status"
         )}),
-        ("Related", {"fields": ("chapter_count", "in_lists", "release_format", "keywords")}),
+        ("Related", {"fields": (
+            "chapter_count", "in_lists", "total_rating", "votes", "release_format", "keywords"
+        )}),
     )
     inlines = (PersonInlineAdmin, PublisherInlineAdmin)
     filter_horizontal = ("release_format", "keywords", "publisher")
-    readonly_fields = ("chapter_count", "in_lists")
+    readonly_fields = ("chapter_count", "in_lists", "total_rating", "votes")
 
 
 class ReleaseFormatAdmin(admin.ModelAdmin):
@@ -42,15 +44,6 @@ class ReleaseFormatAdmin(admin.ModelAdmin):
     )
 
 
-class TitleRatingAdmin(admin.ModelAdmin):
-    model = TitleRating
-    list_display = ("title", "rating", "amount")
-    fieldsets = (
-        (None, {"fields": ("title", "rating", "amount")}),
-    )
-    # readonly_fields = ("amount",)
-
-
 class RatingAdmin(admin.ModelAdmin):
     model = Rating
     list_display = ("id", "mark")
@@ -157,7 +150,6 @@ admin.site.register(Chapter, ChapterAdmin)
 admin.site.register(Publisher, PublisherAdmin)
 admin.site.register(Keyword, KeywordAdmin)
 admin.site.register(Person, PersonAdmin)
-admin.site.register(TitleRating, TitleRatingAdmin)
 admin.site.register(Rating, RatingAdmin)
 admin.site.register(Title, TitleAdmin)
 admin.site.register(ReleaseFormat, ReleaseFormatAdmin)
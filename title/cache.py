@@ -0,0 +1,73 @@
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+import time
+
+TITLES = "titles"
+CHAPTERS = "chapters"
+FILTERS = "filters"
+# titles, ratings, chapter counts and keyword/format relations the columnar filter index is built from
+CATALOGUE = "catalogue"
+TRENDING = "trending"
+
+
+def title_tag(slug: str) -> str:
+    return f"title:{slug}"
+
+
+def chapter_list_tag(title_id: int, team_id: int) -> str:
+    return f"chapters:{title_id}:{team_id}"
+
+
+def tag_versions(tags) -> str:
+    keys = [f"tag:{tag}" for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # an evicted tag starts from a new version, so entries cached under the old one are never served
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return ".".join(str(versions[key]) for key in keys)
+
+
+def cached(key: str, tags, build, timeout: int = None):
+    # entries are keyed by the current versions of their tags, invalidating a tag makes them unreachable
+    versioned_key = f"response:{key}:{tag_versions(tags)}"
+    data = cache.get(versioned_key)
+    if data is None:
+        data = build()
+        cache.set(versioned_key, data, timeout or settings.RESPONSE_CACHE_TIMEOUT)
+    return data
+
+
+def bump_tags(*tags):
+    for tag in tags:
+        try:
+            cache.incr(f"tag:{tag}")
+        except ValueError:
+            # missing tags get a new version on the next read
+            pass
+
+
+def invalidate(*tags):
+    # bumped again on commit, entries cached from the old data in between are dropped as well
+    bump_tags(*tags)
+    transaction.on_commit(lambda: bump_tags(*tags))
+
+
+class CachedListMixin:
+    cache_tags = ()
+    cache_timeout = None
+
+    def get_cache_key(self) -> str:
+        return f"{type(self).__name__}:{urlencode(sorted(self.request.query_params.lists()), doseq=True)}"
+
+    def list(self, request, *args, **kwargs):
+        return Response(cached(
+            self.get_cache_key(),
+            self.cache_tags,
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs).data,
+            self.cache_timeout
+        ))
@@ -0,0 +1,187 @@
+from threading import Lock
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import Rank
+from .cache import CATALOGUE, tag_versions
+from .models import Title
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# TitleFilter order names -> index columns
+ORDER_COLUMNS = {
+    "rating": "total_rating",
+    "name": "name_rank",
+    "date_added": "date_added",
+    "chapters": "chapter_count",
+    "likes": "likes",
+    "ranking": "ranking",
+}
+LOAD_FIELDS = (
+    "id", "release_year", "chapter_count", "total_rating", "date_added", "name_rank",
+    "age_rating", "title_type", "title_status", "licensed", "likes",
+    "ranking", "chapters"
+)
+
+
+def choice_codes(choices) -> dict:
+    return {value: code for code, (value, _) in enumerate(choices)}
+
+
+def bit_matrix(pairs: list, rows: dict, bits: dict):
+    # one row of 64 bit words per title, every keyword or format owns one bit
+    matrix = np.zeros((len(rows), max(1, (len(bits) + 63) // 64)), dtype=np.uint64)
+    if pairs:
+        positions = np.array([(rows[title_id], bits[value]) for title_id, value in pairs], dtype=np.int64)
+        np.bitwise_or.at(
+            matrix,
+            (positions[:, 0], positions[:, 1] // 64),
+            np.left_shift(np.uint64(1), (positions[:, 1] % 64).astype(np.uint64))
+        )
+    return matrix
+
+
+def bit_mask(bits: dict, values, words: int):
+    mask = np.zeros(words, dtype=np.uint64)
+    for value in values:
+        mask[bits[value] // 64] |= np.left_shift(np.uint64(1), np.uint64(bits[value] % 64))
+    return mask
+
+
+class CatalogueIndex:
+    age_codes = choice_codes(Title.TitleAgeRating.choices)
+    type_codes = choice_codes(Title.TitleType.choices)
+    status_codes = choice_codes(Title.TitleStatus.choices)
+
+    def __init__(self, version: str, titles: list, keywords: list, formats: list):
+        # titles are rows of LOAD_FIELDS, keywords and formats are (title id, slug) pairs
+        self.version = version
+        self.loaded_at = time.monotonic()
+        rows = {title[0]: row for row, title in enumerate(titles)}
+        columns = list(zip(*titles)) or [()] * len(LOAD_FIELDS)
+        self.id = np.array(columns[0], dtype=np.int64)
+        self.release_year = np.array(columns[1], dtype=np.int32)
+        self.chapter_count = np.array(columns[2], dtype=np.int32)
+        self.total_rating = np.array(columns[3], dtype=np.float64)
+        self.date_added = np.array([date_added.timestamp() for date_added in columns[4]], dtype=np.float64)
+        self.name_rank = np.array(columns[5], dtype=np.int64)
+        self.age = np.array([self.age_codes.get(value, -1) for value in columns[6]], dtype=np.int8)
+        self.type = np.array([self.type_codes.get(value, -1) for value in columns[7]], dtype=np.int8)
+        self.status = np.array([self.status_codes.get(value, -1) for value in columns[8]], dtype=np.int8)
+        self.licensed = np.array(columns[9], dtype=bool)
+        self.likes = np.array(columns[10], dtype=np.int64)
+        self.ranking = np.array(columns[11], dtype=np.float64)
+        # titles without a known number of chapters are NaN and never match a range, as NULL in SQL
+        self.chapters = np.array([np.nan if value is None else value for value in columns[12]], dtype=np.float64)
+        self.keyword_bits = {slug: bit for bit, slug in enumerate(sorted({slug for _, slug in keywords}))}
+        self.keywords = bit_matrix(keywords, rows, self.keyword_bits)
+        self.format_bits = {slug: bit for bit, slug in enumerate(sorted({slug for _, slug in formats}))}
+        self.formats = bit_matrix(formats, rows, self.format_bits)
+
+    @classmethod
+    def load(cls, version: str):
+        return cls(
+            version,
+            list(Title.objects.annotate(
+                # names are ranked by postgres so the collation matches the ORM ordering
+                name_rank=Window(expression=Rank(), order_by=F("name").asc())
+            ).values_list(*LOAD_FIELDS)),
+            list(Title.keywords.through.objects.values_list("title_id", "keyword__slug")),
+            list(Title.release_format.through.objects.values_list("title_id", "releaseformat__slug"))
+        )
+
+    def matches(self, cleaned_data: dict):
+        selected = np.ones(len(self.id), dtype=bool)
+        for field, column in (
+            ("year", self.release_year), ("chapters", self.chapters), ("total_rating", self.total_rating)
+        ):
+            value = cleaned_data.get(field)
+            if value is not None and value.start is not None:
+                selected &= column >= value.start
+            if value is not None and value.stop is not None:
+                selected &= column <= value.stop
+        for field, column, codes in (
+            ("age", self.age, self.age_codes), ("type", self.type, self.type_codes),
+            ("status", self.status, self.status_codes)
+        ):
+            if cleaned_data.get(field):
+                selected &= np.isin(column, [codes[value] for value in cleaned_data[field]])
+        if cleaned_data.get("licensed") is not None:
+            selected &= self.licensed == cleaned_data["licensed"]
+        for field, matrix, bits, conjoined, exclude in (
+            ("release_format", self.formats, self.format_bits, False, False),
+            ("release_format_ex", self.formats, self.format_bits, False, True),
+            ("keyword", self.keywords, self.keyword_bits, True, False),
+            ("keyword_ex", self.keywords, self.keyword_bits, False, True),
+        ):
+            slugs = [value.slug for value in cleaned_data.get(field) or []]
+            if not slugs:
+                continue
+            known = [slug for slug in slugs if slug in bits]
+            if conjoined and len(known) != len(slugs):
+                # no title has a keyword that isn't in the snapshot yet
+                return np.zeros(len(self.id), dtype=bool)
+            overlap = matrix & bit_mask(bits, known, matrix.shape[1])
+            if conjoined:
+                selected &= (overlap == bit_mask(bits, known, matrix.shape[1])).all(axis=1)
+            elif exclude:
+                selected &= ~overlap.any(axis=1)
+            else:
+                selected &= overlap.any(axis=1)
+        return selected
+
+    def filter(self, cleaned_data: dict):
+        orders = list(cleaned_data.get("order") or [])
+        if any(order.lstrip("-") not in ORDER_COLUMNS for order in orders):
+            return None
+        selected = np.flatnonzero(self.matches(cleaned_data))
+        # id is the tie-breaker and follows the direction of the main ordering, as in TitlePagination
+        keys = [
+            getattr(self, ORDER_COLUMNS[order.lstrip("-")])[selected] * (-1 if order.startswith("-") else 1)
+            for order in orders
+        ]
+        keys.append(self.id[selected] * (-1 if orders and orders[0].startswith("-") else 1))
+        return self.id[selected[np.lexsort(keys[::-1])]].tolist()
+
+
+index = None
+index_lock = Lock()
+
+
+def catalogue_index() -> CatalogueIndex:
+    global index
+    version = tag_versions([CATALOGUE])
+    with index_lock:
+        if index is None or (
+            index.version != version
+            and time.monotonic() - index.loaded_at >= settings.CATALOGUE_INDEX_REFRESH_INTERVAL
+        ):
+            index = CatalogueIndex.load(version)
+        return index
+
+
+def columnar_filter(filterset) -> dict:
+    # cleaned filter data when the columnar engine can evaluate it, otherwise None
+    if np is None or settings.TITLE_FILTER_ENGINE != "columnar":
+        return None
+    if not filterset.is_valid() or filterset.form.cleaned_data.get("name"):
+        return None
+    return filterset.form.cleaned_data
+
+
+def filter_title_ids(filterset):
+    # ids of every matching title in order, or None when the ORM has to evaluate the filter
+    cleaned_data = columnar_filter(filterset)
+    return None if cleaned_data is None else catalogue_index().filter(cleaned_data)
+
+
+def match_title_ids(filterset):
+    # unordered ids of matching titles, or None when the ORM has to evaluate the filter
+    cleaned_data = columnar_filter(filterset)
+    if cleaned_data is None:
+        return None
+    index = catalogue_index()
+    return index.id[index.matches(cleaned_data)]
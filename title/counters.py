@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from .cache import CATALOGUE, title_tag, invalidate
+from .documents import stale_title_documents
+from .models import Title
+
+# flushes only mark the catalogue, its likes ordering and columnar index are refreshed by refresh_catalogue_likes
+CATALOGUE_LIKES_CHANGED = "catalogue:likes-changed"
+
+# deltas are folded per chapter, title and liked hour in one statement, likes of deleted chapters are dropped,
+# an unlike is taken back from whichever activity bucket still holds the like
+FLUSH_LIKES_SQL = """
+    with deltas as (
+        delete from title_chapterlikedelta
+        where id in (
+            select id from title_chapterlikedelta
+            order by id
+            limit %(batch)s
+            for update skip locked
+        )
+        returning chapter_id, liked_at, delta
+    ),
+    chapters as (
+        update title_chapter
+        set likes = title_chapter.likes + counted.delta
+        from (
+            select chapter_id, sum(delta) as delta
+            from deltas
+            group by chapter_id
+        ) as counted
+        where title_chapter.id = counted.chapter_id and counted.delta != 0
+        returning title_chapter.title_id, counted.delta
+    ),
+    titles as (
+        update title_title
+        set likes = greatest(title_title.likes + counted.delta, 0)
+        from (
+            select title_id, sum(delta) as delta
+            from chapters
+            group by title_id
+        ) as counted
+        where title_title.id = counted.title_id
+        returning title_title.id
+    ),
+    activity as (
+        select title_chapter.title_id, date_trunc('hour', deltas.liked_at) as hour, sum(deltas.delta) as delta
+        from deltas
+        join title_chapter on title_chapter.id = deltas.chapter_id
+        group by title_chapter.title_id, date_trunc('hour', deltas.liked_at)
+    ),
+    added as (
+        insert into title_titleactivity (title_id, bucket, daily, likes, ratings, list_adds, comments)
+        select title_id, hour, false, delta, 0, 0, 0
+        from activity
+        where delta > 0
+        on conflict (title_id, bucket, daily) do update
+        set likes = title_titleactivity.likes + excluded.likes
+    ),
+    retracted as (
+        update title_titleactivity
+        set likes = greatest(title_titleactivity.likes - matched.likes, 0)
+        from (
+            select bucket.id, -sum(activity.delta) as likes
+            from activity
+            join title_titleactivity as bucket on bucket.title_id = activity.title_id and (
+                (not bucket.daily and bucket.bucket = activity.hour)
+                or (bucket.daily and bucket.bucket = date_trunc('day', activity.hour))
+            )
+            where activity.delta < 0
+            group by bucket.id
+        ) as matched
+        where title_titleactivity.id = matched.id
+    )
+    select id from titles;
+"""
+
+
+def flush_likes() -> list:
+    # ids of titles whose likes changed
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(FLUSH_LIKES_SQL, {"batch": settings.CHAPTER_LIKES_FLUSH_BATCH_SIZE})
+        title_ids = [title_id for title_id, in cursor.fetchall()]
+        if title_ids:
+            stale_title_documents(title_id__in=title_ids)
+            invalidate(
+                *[title_tag(slug) for slug in Title.objects.filter(id__in=title_ids).values_list("slug", flat=True)]
+            )
+            transaction.on_commit(lambda: cache.set(CATALOGUE_LIKES_CHANGED, True, None))
+    return title_ids
+
+
+def refresh_catalogue_likes() -> bool:
+    if not cache.delete(CATALOGUE_LIKES_CHANGED):
+        return False
+    invalidate(CATALOGUE)
+    return True
@@ -0,0 +1,47 @@
+from django.db.models import Value, F
+from django.shortcuts import get_object_or_404
+from .models import Title, TitleDocument
+from .serializers import TitleDetailsSerializer
+
+
+def build_title_document(title_id: int) -> dict:
+    title = Title.objects.annotate(subscribed=Value(False)).prefetch_related(
+        "release_format", "publisher", "persons_of_title__person", "keywords", "teams"
+    ).get(id=title_id)
+    document = TitleDetailsSerializer(title).data
+    del document["subscribed"]
+    return document
+
+
+def title_document(slug: str) -> tuple:
+    row = TitleDocument.objects.filter(title__slug=slug).values_list("title_id", "document", "generation").first()
+    if row is None:
+        title_id = get_object_or_404(Title.objects.values_list("id", flat=True), slug=slug)
+        TitleDocument.objects.get_or_create(title_id=title_id)
+        row = (title_id, None, 0)
+    title_id, document, generation = row
+    if document is None:
+        document = build_title_document(title_id)
+        # a document built while the title changed again isn't stored, the next read builds it once more
+        TitleDocument.objects.filter(title_id=title_id, generation=generation).update(document=document)
+    return title_id, document
+
+
+def stale_title_documents(**lookups):
+    TitleDocument.objects.filter(**lookups).update(document=None, generation=F("generation") + 1)
+
+
+def overlay_title_document(document: dict, request, subscribed: bool) -> dict:
+    # media urls are stored relative and made absolute for the current request
+    def absolute(url):
+        return request.build_absolute_uri(url) if url else url
+
+    document["poster"] = absolute(document["poster"])
+    for publisher in document["publisher"]:
+        publisher["picture"] = absolute(publisher["picture"])
+    for person in document["person"]:
+        person["person"]["picture"] = absolute(person["person"]["picture"])
+    for team in document["teams"]:
+        team["picture"] = absolute(team["picture"])
+    document["subscribed"] = subscribed
+    return document
@@ -0,0 +1,84 @@
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import OuterRef
+from .filters import TitleFilter
+from .models import Title
+
+# facet -> position of its values in a title row
+FACETS = {
+    "age": 0,
+    "type": 1,
+    "status": 2,
+    "release_format": 3,
+    "keyword": 4,
+}
+MULTI_VALUED_FACETS = ("release_format", "keyword")
+# a title has to have every selected keyword, for the other facets any selected value is enough
+CONJOINED_FACETS = ("keyword",)
+
+
+def is_faceted(request) -> bool:
+    return str(request.query_params.get("facets", "")).lower() in ("1", "true")
+
+
+def facet_selection(filterset: TitleFilter) -> dict:
+    cleaned_data = filterset.form.cleaned_data
+    return {
+        facet: frozenset(
+            value.slug if facet in MULTI_VALUED_FACETS else value for value in cleaned_data.get(facet) or []
+        ) for facet in FACETS
+    }
+
+
+def facet_matches(facet: str, values: frozenset, selected: frozenset) -> bool:
+    if not selected:
+        return True
+    if facet in CONJOINED_FACETS:
+        return selected <= values
+    return not selected.isdisjoint(values)
+
+
+def count_facets(rows, selection: dict) -> dict:
+    # one pass over titles: a title counts toward a facet if it matches every other facet,
+    # conjoined facets also keep their own selection as ticking a value only narrows them further
+    counts = {facet: {} for facet in FACETS}
+    total = 0
+    for row in rows:
+        values = {
+            facet: frozenset(row[index] or ()) if facet in MULTI_VALUED_FACETS else frozenset((row[index],))
+            for facet, index in FACETS.items()
+        }
+        failed = [facet for facet in FACETS if not facet_matches(facet, values[facet], selection[facet])]
+        if not failed:
+            total += 1
+            counted = list(FACETS)
+        elif len(failed) == 1 and failed[0] not in CONJOINED_FACETS:
+            counted = failed
+        else:
+            continue
+        for facet in counted:
+            value_counts = counts[facet]
+            for value in values[facet]:
+                value_counts[value] = value_counts.get(value, 0) + 1
+    return {"count": total, **counts}
+
+
+def facet_counts(data) -> dict:
+    filterset = TitleFilter(data=data.copy(), queryset=Title.objects.all())
+    if not filterset.is_valid():
+        return {}
+    selection = facet_selection(filterset)
+    # facet filters are evaluated while counting, everything else narrows the titles in SQL
+    base_data = data.copy()
+    for facet in FACETS:
+        base_data.pop(facet, None)
+    rows = TitleFilter(data=base_data, queryset=Title.objects.all()).qs.order_by().values_list(
+        "age_rating", "title_type", "title_status"
+    ).annotate(
+        release_formats=ArraySubquery(
+            Title.release_format.through.objects.filter(title_id=OuterRef("id")).values("releaseformat__slug")
+        ),
+        keywords=ArraySubquery(
+            Title.keywords.through.objects.filter(title_id=OuterRef("id")).values("keyword__slug")
+        )
+    )
+    return count_facets(rows.iterator(), selection)
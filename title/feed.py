@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q, Case, When, Value
+from django.db.models.functions import Least
+from django.utils import timezone
+from .models import Chapter, ChapterFeedEntry
+import datetime
+
+
+def add_to_feed(chapter: Chapter):
+    # a chapter published soon after the last entry of its title and team joins it and moves it to the top
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        # one lock per title and team for the rest of the transaction, two uploads can't both open a new entry
+        cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [chapter.title_id, chapter.team_id])
+    entry = ChapterFeedEntry.objects.filter(
+        title_id=chapter.title_id,
+        team_id=chapter.team_id,
+        updated_at__gte=now - datetime.timedelta(seconds=settings.CHAPTER_FEED_GROUP_WINDOW)
+    ).order_by("-updated_at").values_list("id", flat=True).first()
+    if entry is None:
+        ChapterFeedEntry.objects.create(
+            title_id=chapter.title_id,
+            team_id=chapter.team_id,
+            chapter=chapter,
+            first_volume_number=chapter.volume_number,
+            first_chapter_number=chapter.chapter_number,
+            started_at=chapter.date_added,
+            updated_at=now
+        )
+        return
+    earlier = Q(first_volume_number__gt=chapter.volume_number) | Q(
+        first_volume_number=chapter.volume_number, first_chapter_number__gt=chapter.chapter_number
+    )
+    ChapterFeedEntry.objects.filter(id=entry).update(
+        chapter=chapter,
+        chapters=F("chapters") + 1,
+        first_volume_number=Case(When(earlier, then=Value(chapter.volume_number)), default=F("first_volume_number")),
+        first_chapter_number=Case(When(earlier, then=Value(chapter.chapter_number)), default=F("first_chapter_number")),
+        started_at=Least(F("started_at"), Value(chapter.date_added)),
+        updated_at=now
+    )
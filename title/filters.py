@@ -1,5 +1,5 @@
 from .models import Title, Keyword, ReleaseFormat
-from django.db.models import Q
+from .search import search, is_fuzzy
 import django_filters
 
 
@@ -55,14 +55,14 @@ class TitleFilter(django_filters.FilterSet):
             ("name", "name"),
             ("date_added", "date_added"),
             ("chapter_count", "chapters"),
+            ("likes", "likes"),
+            ("ranking", "ranking"),
         ),
 
     )
 
     def filter_by_all_name_fields(self, queryset, name, value):
-        return queryset.filter(
-            Q(name__icontains=value) | Q(english_name__icontains=value) | Q(alternative_names__icontains=value)
-        )
+        return search(queryset, value, vector="search_vector", fuzzy=is_fuzzy(self.data), rank=False)
 
     class Meta:
         model = Title
@@ -86,5 +86,7 @@ class RelatedTitleFilter(django_filters.FilterSet):
             ("name", "name"),
             ("date_added", "date_added"),
             ("chapter_count", "chapters"),
+            ("likes", "likes"),
+            ("ranking", "ranking"),
         )
     )
@@ -0,0 +1,34 @@
+from io import BytesIO
+from zipfile import ZipFile, ZIP_STORED
+from django.core.management.base import BaseCommand
+from title.pipeline import upload_archive_images
+from title.storage import InMemoryPageStorage
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = "Benchmark chapter page ingestion against an in-memory page storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=100)
+        parser.add_argument("--page-size", type=int, default=1024 ** 2, help="Page size in bytes")
+        parser.add_argument("--latency", type=float, default=0.2, help="Fake upload latency in seconds")
+        parser.add_argument("--workers", type=int, default=8)
+
+    def handle(self, *args, **options):
+        archive = BytesIO()
+        with ZipFile(archive, "w", ZIP_STORED) as zip_file:
+            for page in range(options["pages"]):
+                zip_file.writestr(f"{page + 1}.jpg", os.urandom(options["page_size"]))
+
+        for workers in (1, options["workers"]):
+            archive.seek(0)
+            storage = InMemoryPageStorage(latency=options["latency"])
+            start = time.perf_counter()
+            upload_archive_images(archive, "benchmark", storage=storage, workers=workers)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"workers={workers}: {len(storage.files)} pages in {elapsed:.2f}s "
+                f"({len(storage.files) / elapsed:.1f} pages/s)"
+            )
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from title.counters import flush_likes
+from title.models import Chapter, ChapterLikes, ChapterLikeDelta
+import datetime
+import time
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent likes of a single chapter"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chapter", type=int, help="Chapter id, the most liked chapter by default")
+        parser.add_argument("--likes", type=int, default=2000, help="Likes per concurrency level")
+        parser.add_argument("--concurrency", type=int, action="append", help="Number of workers, may be repeated")
+        parser.add_argument(
+            "--baseline", action="store_true",
+            help="Also update the chapter row in every like transaction, as the counters did before"
+        )
+
+    def like(self, chapter: Chapter, user_ids: list, baseline: bool):
+        try:
+            for user_id in user_ids:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    ChapterLikes.objects.create(user_id=user_id, chapter=chapter)
+                    if baseline:
+                        cursor.execute("UPDATE title_chapter SET likes = likes + 1 WHERE id = %s", [chapter.id])
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        chapters = Chapter.objects.order_by("-likes")
+        chapter = chapters.filter(id=options["chapter"]).first() if options["chapter"] else chapters.first()
+        if chapter is None:
+            raise CommandError("no chapter to like")
+
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(
+                username=f"like-benchmark-{number}", email=f"like-benchmark-{number}@example.com",
+                birth_date=datetime.date(2000, 1, 1)
+            ) for number in range(options["likes"])
+        )
+        user_ids = [user.id for user in users]
+        try:
+            for workers in options["concurrency"] or [1, 4, 16]:
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    for result in [
+                        executor.submit(self.like, chapter, user_ids[worker::workers], options["baseline"])
+                        for worker in range(workers)
+                    ]:
+                        result.result()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"workers={workers}: {len(user_ids)} likes in {elapsed:.2f}s ({len(user_ids) / elapsed:.1f} likes/s)"
+                )
+                ChapterLikes.objects.filter(user_id__in=user_ids).delete()
+                if options["baseline"]:
+                    Chapter.objects.filter(id=chapter.id).update(likes=chapter.likes)
+        finally:
+            ChapterLikes.objects.filter(user_id__in=user_ids).delete()
+            get_user_model().objects.filter(id__in=user_ids).delete()
+            # likes and unlikes cancel out once flushed
+            while ChapterLikeDelta.objects.filter(chapter_id=chapter.id).exists():
+                flush_likes()
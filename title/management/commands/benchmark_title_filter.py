@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from title.columnar import CatalogueIndex, np
+from title.filters import TitleFilter
+from title.models import Title, Keyword, ReleaseFormat
+import time
+
+QUERIES = [
+    "",
+    "order=name",
+    "year_min=2010&year_max=2020&order=-chapters",
+    "total_rating_min=4&status={status}",
+    "type={type}&type={other_type}&licensed=false&order=-date_added",
+    "keyword={keyword}&release_format={release_format}",
+    "keyword_ex={keyword}&release_format_ex={release_format}&chapters_min=10",
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark catalogue filtering with the ORM against the in-memory columnar index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--limit", type=int, default=20, help="Page size")
+        parser.add_argument("--query", action="append", help="Filter query string, may be repeated")
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError("numpy is not installed")
+        start = time.perf_counter()
+        index = CatalogueIndex.load("benchmark")
+        self.stdout.write(f"index of {len(index.id)} titles built in {time.perf_counter() - start:.3f}s")
+        values = {
+            "status": Title.TitleStatus.choices[0][0],
+            "type": Title.TitleType.choices[0][0],
+            "other_type": Title.TitleType.choices[1][0],
+            "keyword": Keyword.objects.values_list("slug", flat=True).first() or "",
+            "release_format": ReleaseFormat.objects.values_list("slug", flat=True).first() or "",
+        }
+        limit = options["limit"]
+        for query in options["query"] or [query.format(**values) for query in QUERIES]:
+            filterset = TitleFilter(data=QueryDict(query), queryset=Title.objects.catalogue())
+            if not filterset.is_valid():
+                self.stdout.write(self.style.WARNING(f"{query!r}: invalid filter {dict(filterset.errors)}"))
+                continue
+
+            start = time.perf_counter()
+            for _ in range(options["repeat"]):
+                count = filterset.qs.count()
+                orm_page = list(filterset.qs.values_list("id", flat=True)[:limit])
+            orm = (time.perf_counter() - start) / options["repeat"]
+
+            start = time.perf_counter()
+            for _ in range(options["repeat"]):
+                title_ids = index.filter(filterset.form.cleaned_data)
+                list(Title.objects.catalogue().in_bulk(title_ids[:limit]))
+            columnar = (time.perf_counter() - start) / options["repeat"]
+
+            # pages may only differ in the order of ties, the ORM path has no id tie-breaker
+            same = len(title_ids) == count and set(title_ids[:limit]) == set(orm_page)
+            self.stdout.write(
+                f"{query or '(no filters)'!r}: {count} titles, orm {orm * 1000:.1f}ms, "
+                f"columnar {columnar * 1000:.1f}ms ({orm / columnar:.1f}x)"
+                + ("" if same else self.style.WARNING(" results differ"))
+            )
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+TEAM_CHAPTERS_SQL = """
+    select title_id, team_id, count(*) as chapters
+    from title_chapter
+    group by title_id, team_id
+"""
+
+TITLE_TEAM_MISMATCHES_SQL = f"""
+    select count(*)
+    from ({TEAM_CHAPTERS_SQL}) as counted
+    full join title_titleteam using (title_id, team_id)
+    where counted.chapters is distinct from title_titleteam.chapter_count
+"""
+
+TITLE_MISMATCHES_SQL = f"""
+    select count(*)
+    from title_title
+    left join (
+        select title_id, max(chapters) as chapters
+        from ({TEAM_CHAPTERS_SQL}) as counted
+        group by title_id
+    ) as counted on counted.title_id = title_title.id
+    where title_title.chapter_count != coalesce(counted.chapters, 0)
+"""
+
+FIX_CHAPTER_COUNTS_SQL = f"""
+    insert into title_titleteam (title_id, team_id, chapter_count)
+    {TEAM_CHAPTERS_SQL}
+    on conflict (title_id, team_id) do update
+    set chapter_count = excluded.chapter_count
+    where title_titleteam.chapter_count != excluded.chapter_count;
+    delete from title_titleteam
+    where not exists(
+        select id from title_chapter
+        where title_id = title_titleteam.title_id and team_id = title_titleteam.team_id
+    );
+    update title_title
+    set chapter_count = coalesce(counted.chapters, 0)
+    from title_title as t
+    left join (
+        select title_id, max(chapter_count) as chapters
+        from title_titleteam
+        group by title_id
+    ) as counted on counted.title_id = t.id
+    where title_title.id = t.id and title_title.chapter_count != coalesce(counted.chapters, 0);
+"""
+
+
+class Command(BaseCommand):
+    help = "Check per-team and per-title chapter counters against actual chapters"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Recount mismatched counters")
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(TITLE_TEAM_MISMATCHES_SQL)
+            title_teams = cursor.fetchone()[0]
+            cursor.execute(TITLE_MISMATCHES_SQL)
+            titles = cursor.fetchone()[0]
+            if not title_teams and not titles:
+                self.stdout.write(self.style.SUCCESS("Chapter counters are consistent"))
+                return
+            self.stdout.write(
+                self.style.WARNING(f"Mismatched counters: {title_teams} title teams, {titles} titles")
+            )
+            if options["fix"]:
+                cursor.execute(FIX_CHAPTER_COUNTS_SQL)
+                self.stdout.write(self.style.SUCCESS("Chapter counters recounted"))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+# likes not flushed yet are counted with their chapter
+CHAPTER_MISMATCHES_SQL = """
+    select count(*)
+    from title_chapter
+    where likes + (select coalesce(sum(delta), 0) from title_chapterlikedelta where chapter_id = title_chapter.id)
+        != (select count(*) from title_chapterlikes where chapter_id = title_chapter.id)
+"""
+
+TITLE_MISMATCHES_SQL = """
+    select count(*)
+    from title_title
+    where likes != (select coalesce(sum(likes), 0) from title_chapter where title_id = title_title.id)
+"""
+
+# likes are locked while recounting, pending deltas would otherwise be applied on top of the recount
+FIX_LIKES_SQL = """
+    lock table title_chapterlikes in share mode;
+    delete from title_chapterlikedelta;
+    update title_chapter
+    set likes = counted.likes
+    from (
+        select title_chapter.id, count(title_chapterlikes.id) as likes
+        from title_chapter
+        left join title_chapterlikes on title_chapterlikes.chapter_id = title_chapter.id
+        group by title_chapter.id
+    ) as counted
+    where title_chapter.id = counted.id and title_chapter.likes != counted.likes;
+    update title_title
+    set likes = counted.likes
+    from (
+        select title_title.id, coalesce(sum(title_chapter.likes), 0) as likes
+        from title_title
+        left join title_chapter on title_chapter.title_id = title_title.id
+        group by title_title.id
+    ) as counted
+    where title_title.id = counted.id and title_title.likes != counted.likes;
+"""
+
+
+class Command(BaseCommand):
+    help = "Check chapter and title like counters against actual chapter likes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Recount mismatched counters")
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(CHAPTER_MISMATCHES_SQL)
+            chapters = cursor.fetchone()[0]
+            cursor.execute(TITLE_MISMATCHES_SQL)
+            titles = cursor.fetchone()[0]
+            if not chapters and not titles:
+                self.stdout.write(self.style.SUCCESS("Like counters are consistent"))
+                return
+            self.stdout.write(self.style.WARNING(f"Mismatched counters: {chapters} chapters, {titles} titles"))
+            if options["fix"]:
+                cursor.execute(FIX_LIKES_SQL)
+                self.stdout.write(self.style.SUCCESS("Like counters recounted"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from title.models import Chapter, Team
+from title.purge import purge_chapters, purge_team
+
+
+class Command(BaseCommand):
+    help = "Delete chapters of a team or a title in bulk together with their pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--team", help="Slug of a team to delete with all of its chapters")
+        parser.add_argument("--title", help="Slug of a title whose chapters are deleted")
+
+    def progress(self, done: int, total: int):
+        self.stdout.write(f"{done}/{total} chapters deleted")
+
+    def handle(self, *args, **options):
+        if options["team"] and not options["title"]:
+            try:
+                team = Team.objects.get(slug=options["team"])
+            except Team.DoesNotExist:
+                raise CommandError(f"Team {options['team']} doesn't exist")
+            purged = purge_team(team, self.progress)
+        elif options["title"]:
+            chapters = Chapter.objects.filter(title__slug=options["title"])
+            if options["team"]:
+                chapters = chapters.filter(team__slug=options["team"])
+            purged = purge_chapters(chapters.values_list("id", flat=True), self.progress)
+        else:
+            raise CommandError("Either --team or --title is required")
+        self.stdout.write(self.style.SUCCESS(f"Deleted {purged} chapters"))
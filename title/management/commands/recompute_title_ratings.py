@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from title.models import MAX_RATING_MARK
+
+RECOMPUTE_TITLE_RATINGS_SQL = f"""
+    with histograms as (
+        select title.id as title_id,
+            array_agg(coalesce(r.votes, 0) order by marks.mark) as histogram,
+            coalesce(sum(r.votes), 0) as votes,
+            coalesce(sum(r.votes * marks.mark), 0) as rating_sum
+        from title_title as title
+        cross join generate_series(0, {MAX_RATING_MARK}) as marks(mark)
+        left join (
+            select utr.title_id, rating.mark, count(*)::integer as votes
+            from title_usertitlerating as utr
+            join title_rating as rating on rating.id = utr.rating_id
+            group by utr.title_id, rating.mark
+        ) as r on r.title_id = title.id and r.mark = marks.mark
+        group by title.id
+    )
+    update title_title
+    set rating_histogram = histograms.histogram,
+        votes = histograms.votes,
+        rating_sum = histograms.rating_sum,
+        total_rating = histograms.rating_sum * 1.0 / greatest(histograms.votes, 1)
+    from histograms
+    where title_title.id = histograms.title_id and (
+        title_title.rating_histogram != histograms.histogram
+        or title_title.votes != histograms.votes
+        or title_title.rating_sum != histograms.rating_sum
+    )
+"""
+
+
+class Command(BaseCommand):
+    help = "Recompute stored title ratings (histogram, votes, rating sum and total rating) from user votes"
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(RECOMPUTE_TITLE_RATINGS_SQL)
+            self.stdout.write(self.style.SUCCESS(f"Updated ratings of {cursor.rowcount} titles"))
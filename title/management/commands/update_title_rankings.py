@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from title.cache import CATALOGUE, invalidate
+from title.ranking import update_title_rankings
+import time
+
+
+class Command(BaseCommand):
+    help = "Recompute bayesian rankings of every title"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        updated = update_title_rankings(force=True)
+        if updated:
+            invalidate(CATALOGUE)
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated rankings of {updated} titles in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0036_title_chapters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='rating_sum',
+            field=models.PositiveIntegerField(blank=True, default=0, verbose_name='rating sum'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='total_rating',
+            field=models.FloatField(blank=True, db_index=True, default=0, verbose_name='total rating'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='votes',
+            field=models.PositiveIntegerField(blank=True, default=0, verbose_name='votes'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                update title_title
+                set votes = r.votes,
+                    rating_sum = r.rating_sum,
+                    total_rating = r.rating_sum * 1.0 / greatest(r.votes, 1)
+                from (
+                    select utr.title_id, count(*) as votes, sum(rating.mark) as rating_sum
+                    from title_usertitlerating as utr
+                    join title_rating as rating on rating.id = utr.rating_id
+                    group by utr.title_id
+                ) as r
+                where title_title.id = r.title_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
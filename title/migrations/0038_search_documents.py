@@ -0,0 +1,92 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:51
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0037_title_rating_aggregate'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='person',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='person_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='person_search_vec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publisher',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='publisher_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='publisher',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='publisher_search_vec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('name'), name='gin_trgm_ops'), name='team_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='title_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='title_search_vec_idx'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                update title_title
+                set search_document = lower(
+                    concat_ws(' ', name, english_name, array_to_string(alternative_names, ' '))
+                );
+                update title_person
+                set search_document = lower(concat_ws(' ', name, array_to_string(alternative_names, ' ')));
+                update title_publisher
+                set search_document = lower(concat_ws(' ', name, array_to_string(alternative_names, ' ')));
+                update title_title set search_vector = to_tsvector('simple', search_document);
+                update title_person set search_vector = to_tsvector('simple', search_document);
+                update title_publisher set search_vector = to_tsvector('simple', search_document);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:54
+
+import cloudinary.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0038_search_documents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterUploadJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('archive', models.CharField(max_length=100, verbose_name='archive name')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_jobs_of_chapter', to='title.chapter')),
+            ],
+            options={
+                'unique_together': {('chapter', 'archive')},
+            },
+        ),
+        migrations.AddField(
+            model_name='chapterimages',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.CreateModel(
+            name='ChapterUploadPage',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('image', cloudinary.models.CloudinaryField(max_length=255)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages_of_job', to='title.chapteruploadjob')),
+            ],
+            options={
+                'unique_together': {('job', 'content_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0039_chapter_upload_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='image_manifest',
+            field=models.JSONField(blank=True, null=True, verbose_name='archive pages manifest'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0040_chapter_image_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterImageVariant',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('format', models.CharField(choices=[('avif', 'AVIF'), ('webp', 'WebP')], max_length=4)),
+                ('width', models.PositiveSmallIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=150)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants_of_image', to='title.chapterimages')),
+            ],
+            options={
+                'unique_together': {('image', 'format', 'width')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0041_chapter_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chapterimages',
+            name='image',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='chapteruploadpage',
+            name='image',
+            field=models.CharField(max_length=255),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0042_chapter_page_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='titleteam',
+            name='chapter_count',
+            field=models.PositiveIntegerField(blank=True, default=0, verbose_name='chapter count'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                update title_titleteam
+                set chapter_count = counted.chapters
+                from (
+                    select title_id, team_id, count(*) as chapters
+                    from title_chapter
+                    group by title_id, team_id
+                ) as counted
+                where title_titleteam.title_id = counted.title_id and title_titleteam.team_id = counted.team_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
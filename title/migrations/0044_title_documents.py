@@ -0,0 +1,23 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:06
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0043_title_team_chapter_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleDocument',
+            fields=[
+                ('title', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document_of_title', serialize=False, to='title.title')),
+                ('document', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('generation', models.PositiveIntegerField(blank=True, default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0045_title_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='likes',
+            field=models.PositiveIntegerField(blank=True, default=0, verbose_name='likes'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                update title_title
+                set likes = counted.likes
+                from (
+                    select title_id, sum(likes) as likes
+                    from title_chapter
+                    group by title_id
+                ) as counted
+                where title_title.id = counted.title_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['likes', 'id'], name='title_likes_keyset_idx'),
+        ),
+    ]
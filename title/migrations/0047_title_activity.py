@@ -0,0 +1,68 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0046_title_likes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleActivity',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('bucket', models.DateTimeField(verbose_name='bucket start')),
+                ('daily', models.BooleanField(blank=True, default=False)),
+                ('likes', models.PositiveIntegerField(blank=True, default=0)),
+                ('ratings', models.PositiveIntegerField(blank=True, default=0)),
+                ('list_adds', models.PositiveIntegerField(blank=True, default=0)),
+                ('comments', models.PositiveIntegerField(blank=True, default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TitleTrending',
+            fields=[
+                ('title', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending_of_title', serialize=False, to='title.title')),
+                ('popular', models.FloatField(blank=True, default=0, verbose_name='popularity')),
+                ('weekly', models.FloatField(blank=True, default=0, verbose_name='trending this week')),
+                ('likes', models.PositiveIntegerField(blank=True, default=0, verbose_name='recent likes')),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='titletrending',
+            index=models.Index(fields=['-popular'], name='title_trending_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='titletrending',
+            index=models.Index(fields=['-weekly'], name='title_trending_weekly_idx'),
+        ),
+        migrations.AddField(
+            model_name='titleactivity',
+            name='title',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_of_title', to='title.title'),
+        ),
+        migrations.AddIndex(
+            model_name='titleactivity',
+            index=models.Index(fields=['bucket'], name='title_activity_bucket_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='titleactivity',
+            unique_together={('title', 'bucket', 'daily')},
+        ),
+        migrations.RunSQL(
+            sql="""
+                insert into title_titleactivity (title_id, bucket, daily, likes, ratings, list_adds, comments)
+                select title_chapter.title_id, date_trunc('hour', title_chapterlikes.date_added), false, count(*), 0, 0, 0
+                from title_chapterlikes
+                join title_chapter on title_chapter.id = title_chapterlikes.chapter_id
+                where title_chapterlikes.date_added >= now() - interval '30 days'
+                group by title_chapter.title_id, date_trunc('hour', title_chapterlikes.date_added);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
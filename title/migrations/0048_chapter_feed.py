@@ -0,0 +1,54 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0047_title_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterFeedEntry',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('chapters', models.PositiveIntegerField(blank=True, default=1, verbose_name='chapters')),
+                ('first_volume_number', models.PositiveSmallIntegerField()),
+                ('first_chapter_number', models.FloatField()),
+                ('updated_at', models.DateTimeField()),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries_of_chapter', to='title.chapter')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries_of_team', to='title.team')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries_of_title', to='title.title')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='chapterfeedentry',
+            index=models.Index(fields=['updated_at', 'id'], name='title_feed_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chapterfeedentry',
+            index=models.Index(fields=['title', 'team', 'updated_at'], name='title_feed_group_idx'),
+        ),
+        # chapters published earlier are grouped per title, team and day
+        migrations.RunSQL(
+            sql="""
+                insert into title_chapterfeedentry (
+                    title_id, team_id, chapter_id, chapters, first_volume_number, first_chapter_number, updated_at
+                )
+                select distinct on (title_id, team_id, date_trunc('day', date_added))
+                    title_id, team_id, id,
+                    count(*) over burst,
+                    first_value(volume_number) over (burst order by volume_number, chapter_number),
+                    first_value(chapter_number) over (burst order by volume_number, chapter_number),
+                    date_added
+                from title_chapter
+                where is_published
+                window burst as (partition by title_id, team_id, date_trunc('day', date_added))
+                order by title_id, team_id, date_trunc('day', date_added), date_added desc;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
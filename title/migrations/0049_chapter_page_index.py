@@ -0,0 +1,39 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0048_chapter_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapterimages',
+            name='page',
+            field=models.PositiveSmallIntegerField(blank=True, default=0, verbose_name='page number'),
+        ),
+        # pages were created in order, so ids give the page numbers of existing chapters
+        migrations.RunSQL(
+            sql="""
+                update title_chapterimages
+                set page = numbered.page
+                from (
+                    select id, row_number() over (partition by chapter_id order by id) as page
+                    from title_chapterimages
+                ) as numbered
+                where title_chapterimages.id = numbered.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='chapter',
+            index=models.Index(fields=['title', 'team', 'volume_number', 'chapter_number'], name='chapter_reading_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chapterimages',
+            index=models.Index(fields=['chapter', 'page'], name='chapter_images_page_idx'),
+        ),
+    ]
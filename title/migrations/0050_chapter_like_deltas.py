@@ -0,0 +1,22 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0049_chapter_page_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterLikeDelta',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('chapter_id', models.IntegerField()),
+                ('liked_at', models.DateTimeField()),
+                ('delta', models.SmallIntegerField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:23
+
+from django.db import migrations, models
+import django_better_admin_arrayfield.models.fields
+import title.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0050_chapter_like_deltas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='rating_histogram',
+            field=django_better_admin_arrayfield.models.fields.ArrayField(base_field=models.PositiveIntegerField(), default=title.models.empty_rating_histogram, editable=False, size=11),
+        ),
+        migrations.RunSQL(
+            sql="""
+                update title_title
+                set rating_histogram = array(
+                    select count(vote.id)::integer
+                    from generate_series(0, 10) as marks(mark)
+                    left join title_rating as rating on rating.mark = marks.mark
+                    left join title_usertitlerating as vote
+                        on vote.rating_id = rating.id and vote.title_id = title_title.id
+                    group by marks.mark
+                    order by marks.mark
+                );
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RemoveField(
+            model_name='title',
+            name='title_rating',
+        ),
+        migrations.DeleteModel(
+            name='TitleRating',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0051_title_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='ranking',
+            field=models.FloatField(blank=True, default=0, editable=False, verbose_name='ranking'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                update title_title
+                set ranking = (prior.mean * 10 + rating_sum) / (10 + votes)
+                from (
+                    select coalesce(sum(rating_sum)::float8 / nullif(sum(votes), 0), 0) as mean
+                    from title_title
+                ) as prior;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['ranking', 'id'], name='title_ranking_keyset_idx'),
+        ),
+    ]
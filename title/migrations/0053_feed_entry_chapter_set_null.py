@@ -0,0 +1,19 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0052_title_ranking'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chapterfeedentry',
+            name='chapter',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='feed_entries_of_chapter', to='title.chapter'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.0.5 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0053_feed_entry_chapter_set_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleRankingPrior',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+                ('mean', models.FloatField(blank=True, default=0, verbose_name='mean mark')),
+                ('votes', models.FloatField(blank=True, default=0, verbose_name='prior votes')),
+            ],
+        ),
+        # the prior rankings were computed with in 0052
+        migrations.RunSQL(
+            sql="""
+                insert into title_titlerankingprior (id, mean, votes)
+                select 1, coalesce(sum(rating_sum)::float8 / nullif(sum(votes), 0), 0), 10
+                from title_title;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.5 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('title', '0054_title_ranking_prior'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapterfeedentry',
+            name='started_at',
+            field=models.DateTimeField(null=True),
+        ),
+        # an entry starts with the first chapter added after the entry before it, entries from 0048 stay in their day
+        migrations.RunSQL(
+            sql="""
+                update title_chapterfeedentry as entry
+                set started_at = coalesce((
+                    select min(chapter.date_added)
+                    from title_chapter as chapter
+                    where chapter.title_id = entry.title_id and chapter.team_id = entry.team_id
+                        and chapter.is_published and chapter.date_added <= entry.updated_at
+                        and chapter.date_added >= date_trunc('day', entry.updated_at)
+                        and chapter.date_added > coalesce((
+                            select max(previous.updated_at)
+                            from title_chapterfeedentry as previous
+                            where previous.title_id = entry.title_id and previous.team_id = entry.team_id
+                                and previous.updated_at < entry.updated_at
+                        ), '-infinity')
+                ), entry.updated_at);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='chapterfeedentry',
+            name='started_at',
+            field=models.DateTimeField(),
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Lower
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.utils.translation import gettext_lazy as _
 from django_better_admin_arrayfield.models.fields import ArrayField
@@ -8,12 +12,18 @@ from django.db.models.signals import pre_delete, pre_save, post_save
 from django.dispatch import receiver
 from model_utils import FieldTracker
 from cloudinary.models import CloudinaryField as BaseCloudinaryField
-import cloudinary
+from .storage import page_storage
+from .trending import record_activity
 import pgtrigger
 import datetime
 
 
 PICTURE_SIZE = (350, 350)
+MAX_RATING_MARK = 10
+
+
+def empty_rating_histogram() -> list:
+    return [0] * (MAX_RATING_MARK + 1)
 
 
 class ReleaseFormat(models.Model):
@@ -27,7 +37,9 @@ class ReleaseFormat(models.Model):
 
 class Rating(models.Model):
     id = models.AutoField(primary_key=True)
-    mark = models.PositiveSmallIntegerField(validators=[MaxValueValidator(10)], unique=True, blank=False, null=False)
+    mark = models.PositiveSmallIntegerField(
+        validators=[MaxValueValidator(MAX_RATING_MARK)], unique=True, blank=False, null=False
+    )
 
     class Meta:
         ordering = ("-mark",)
@@ -36,6 +48,19 @@ class Rating(models.Model):
         return f"Оценка {self.mark}"
 
 
+@pgtrigger.register(
+    pgtrigger.Trigger(
+        name="update_publisher_search_document",
+        operation=pgtrigger.Insert | pgtrigger.UpdateOf("name", "alternative_names"),
+        when=pgtrigger.Before,
+        func=
+        """
+        new.search_document := lower(concat_ws(' ', new.name, array_to_string(new.alternative_names, ' ')));
+        new.search_vector := to_tsvector('simple', new.search_document);
+        return new;
+        """
+    )
+)
 class Publisher(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(_("publisher name"), max_length=30, unique=True, blank=False, null=False)
@@ -49,6 +74,14 @@ class Publisher(models.Model):
     )
     picture = models.ImageField(_("Publisher picture"), upload_to="publishers/pictures/%Y", blank=True)
     description = models.TextField(_("description"), max_length=1000, blank=True, null=False)
+    search_document = models.TextField(editable=False, default="", blank=True, null=False)
+    search_vector = SearchVectorField(editable=False, null=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_document"], opclasses=["gin_trgm_ops"], name="publisher_search_trgm_idx"),
+            GinIndex(fields=["search_vector"], name="publisher_search_vec_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
@@ -61,6 +94,19 @@ class Publisher(models.Model):
         return str(self.name)
 
 
+@pgtrigger.register(
+    pgtrigger.Trigger(
+        name="update_person_search_document",
+        operation=pgtrigger.Insert | pgtrigger.UpdateOf("name", "alternative_names"),
+        when=pgtrigger.Before,
+        func=
+        """
+        new.search_document := lower(concat_ws(' ', new.name, array_to_string(new.alternative_names, ' ')));
+        new.search_vector := to_tsvector('simple', new.search_document);
+        return new;
+        """
+    )
+)
 class Person(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(_("person name"), max_length=30, unique=True, blank=False, null=False)
@@ -73,6 +119,14 @@ class Person(models.Model):
     )
     picture = models.ImageField(_("Person picture"), upload_to="persons/pictures/%Y", blank=True)
     description = models.TextField(_("description"), max_length=1000, blank=True, null=False)
+    search_document = models.TextField(editable=False, default="", blank=True, null=False)
+    search_vector = SearchVectorField(editable=False, null=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_document"], opclasses=["gin_trgm_ops"], name="person_search_trgm_idx"),
+            GinIndex(fields=["search_vector"], name="person_search_vec_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
@@ -106,6 +160,27 @@ class Keyword(models.Model):
         return str(self.name)
 
 
+class TitleQuerySet(models.QuerySet):
+    def catalogue(self):
+        return self.defer("description", "alternative_names", "search_document", "search_vector")
+
+
+@pgtrigger.register(
+    pgtrigger.Trigger(
+        # counter updates don't touch the names, so they don't rebuild the document
+        name="update_title_search_document",
+        operation=pgtrigger.Insert | pgtrigger.UpdateOf("name", "english_name", "alternative_names"),
+        when=pgtrigger.Before,
+        func=
+        """
+        new.search_document := lower(
+            concat_ws(' ', new.name, new.english_name, array_to_string(new.alternative_names, ' '))
+        );
+        new.search_vector := to_tsvector('simple', new.search_document);
+        return new;
+        """
+    )
+)
 class Title(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(_("title name"), max_length=200, unique=True, blank=False, null=False)
@@ -136,8 +211,20 @@ class Title(models.Model):
     chapters = models.PositiveSmallIntegerField(blank=True, null=True)
     chapter_count = models.PositiveIntegerField(_("chapter count"), default=0, blank=True, null=False)
     in_lists = models.PositiveIntegerField(_("in lists"), default=0, blank=True, null=False)
+    likes = models.PositiveIntegerField(_("likes"), default=0, blank=True, null=False)
+    votes = models.PositiveIntegerField(_("votes"), default=0, blank=True, null=False)
+    rating_sum = models.PositiveIntegerField(_("rating sum"), default=0, blank=True, null=False)
+    total_rating = models.FloatField(_("total rating"), default=0, db_index=True, blank=True, null=False)
+    # bayesian average of votes, refreshed by update_title_rankings
+    ranking = models.FloatField(_("ranking"), default=0, editable=False, blank=True, null=False)
+    # votes per mark, indexed by mark
+    rating_histogram = ArrayField(
+        models.PositiveIntegerField(), size=MAX_RATING_MARK + 1, default=empty_rating_histogram, editable=False
+    )
     date_added = models.DateTimeField(auto_now_add=True, blank=True, null=False)
     licensed = models.BooleanField(verbose_name=_("licensed"), blank=False, null=False)
+    search_document = models.TextField(editable=False, default="", blank=True, null=False)
+    search_vector = SearchVectorField(editable=False, null=True)
 
     class TitleAgeRating(models.TextChoices):
         EVERYONE = "E", _("Все возраста")
@@ -187,12 +274,6 @@ class Title(models.Model):
         verbose_name=_("release formats"),
         related_name="titles_with_release_format"
     )
-    title_rating = models.ManyToManyField(
-        Rating,
-        verbose_name=_("title rating"),
-        through="TitleRating",
-        related_name="titles_with_rating"
-    )
     publisher = models.ManyToManyField(
         Publisher,
         verbose_name=_("title publisher"),
@@ -215,7 +296,22 @@ class Title(models.Model):
         verbose_name=_("title teams"),
         through="TitleTeam",
     )
-    tracker = FieldTracker(fields=["title_status"])
+    tracker = FieldTracker(fields=["title_status", "slug"])
+
+    objects = TitleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_document"], opclasses=["gin_trgm_ops"], name="title_search_trgm_idx"),
+            GinIndex(fields=["search_vector"], name="title_search_vec_idx"),
+            # keyset pagination over every catalogue ordering
+            models.Index(fields=["total_rating", "id"], name="title_rating_keyset_idx"),
+            models.Index(fields=["name", "id"], name="title_name_keyset_idx"),
+            models.Index(fields=["date_added", "id"], name="title_date_keyset_idx"),
+            models.Index(fields=["chapter_count", "id"], name="title_chapters_keyset_idx"),
+            models.Index(fields=["likes", "id"], name="title_likes_keyset_idx"),
+            models.Index(fields=["ranking", "id"], name="title_ranking_keyset_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -229,25 +325,25 @@ def title_status_update(sender, instance, **kwargs):
             notify_users_of_new_title_status.delay(instance.id)
 
 
+class TitleDocument(models.Model):
+    title = models.OneToOneField(
+        Title, primary_key=True, related_name="document_of_title", on_delete=models.CASCADE, blank=False, null=False
+    )
+    # serialized title page without user specific fields, empty until it's built again after a change
+    document = models.JSONField(encoder=DjangoJSONEncoder, blank=True, null=True)
+    generation = models.PositiveIntegerField(default=0, blank=True, null=False)
+
+
 class TitleTeam(models.Model):
     id = models.AutoField(primary_key=True)
     title = models.ForeignKey(Title, related_name="teams_of_title", on_delete=models.CASCADE, blank=False, null=False)
     team = models.ForeignKey("Team", related_name="titles_of_team", on_delete=models.CASCADE, blank=False, null=False)
+    chapter_count = models.PositiveIntegerField(_("chapter count"), default=0, blank=True, null=False)
 
     class Meta:
         unique_together = ["title", "team"]
 
 
-class TitleRating(models.Model):
-    id = models.AutoField(primary_key=True)
-    title = models.ForeignKey(Title, related_name="ratings_of_title", on_delete=models.CASCADE, blank=False, null=False)
-    rating = models.ForeignKey(Rating, on_delete=models.CASCADE, blank=False, null=False)
-    amount = models.PositiveIntegerField(default=0, blank=True, null=False)
-
-    class Meta:
-        unique_together = ["title", "rating"]
-
-
 class TitlePerson(models.Model):
     id = models.AutoField(primary_key=True)
     title = models.ForeignKey(Title, related_name="persons_of_title", on_delete=models.CASCADE, blank=False, null=False)
@@ -280,66 +376,70 @@ class TitlePublisher(models.Model):
         unique_together = ["title", "publisher"]
 
 
+class TitleRankingPrior(models.Model):
+    # a single row with the prior of the bayesian rankings, kept by update_title_rankings and read by the vote trigger
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    mean = models.FloatField(_("mean mark"), default=0, blank=True, null=False)
+    votes = models.FloatField(_("prior votes"), default=0, blank=True, null=False)
+
+
+# moves one vote of vote_title from the removed to the added mark, either of them may be null,
+# the ranking is recomputed with the stored prior
+RATE_TITLE_SQL = """
+            UPDATE title_title
+            SET rating_histogram = array(
+                    SELECT amount + CASE slot - 1 WHEN added THEN 1 WHEN removed THEN -1 ELSE 0 END
+                    FROM unnest(rating_histogram) WITH ORDINALITY AS histogram(amount, slot)
+                    ORDER BY slot
+                ),
+                votes = votes + (added IS NOT NULL)::int - (removed IS NOT NULL)::int,
+                rating_sum = rating_sum + coalesce(added, 0) - coalesce(removed, 0),
+                total_rating = (rating_sum + coalesce(added, 0) - coalesce(removed, 0)) * 1.0
+                    / greatest(votes + (added IS NOT NULL)::int - (removed IS NOT NULL)::int, 1),
+                ranking = (
+                    coalesce((SELECT mean * votes FROM title_titlerankingprior), 0)
+                    + rating_sum + coalesce(added, 0) - coalesce(removed, 0)
+                ) / greatest(
+                    coalesce((SELECT votes FROM title_titlerankingprior), 0)
+                    + votes + (added IS NOT NULL)::int - (removed IS NOT NULL)::int, 1
+                )
+            WHERE id = vote_title;
+"""
+
+
 @pgtrigger.register(
     pgtrigger.Trigger(
-        name="delete_if_exists_on_user_vote",
+        name="record_title_activity_on_user_vote",
         operation=pgtrigger.Insert,
-        when=pgtrigger.Before,
-        func=
-        """
-        delete from title_usertitlerating
-        WHERE title_id = new.title_id AND user_id = new.user_id;
-        RETURN NEW;
-        """
-    )
-)
-@pgtrigger.register(
-    pgtrigger.Trigger(
-        name="update_title_rating_on_user_vote_update",
-        operation=pgtrigger.Update,
         when=pgtrigger.After,
-        func=
-        """
-        UPDATE title_titlerating
-        SET amount = amount - 1
-        WHERE title_id = OLD.title_id AND rating_id = OLD.rating_id;
-        UPDATE title_titlerating
-        SET amount = amount + 1
-        WHERE title_id = NEW.title_id AND rating_id = NEW.rating_id;
-        RETURN NEW;
-        """
-    )
-)
-@pgtrigger.register(
-    pgtrigger.Trigger(
-        name="update_title_rating_on_user_vote_delete",
-        operation=pgtrigger.Delete,
-        when=pgtrigger.After,
-        func=
-        """
-        UPDATE title_titlerating
-        SET amount = amount - 1
-        WHERE title_id = OLD.title_id AND rating_id = OLD.rating_id;
-        RETURN OLD;
-        """
+        func=record_activity("ratings", "select new.title_id") + "return null;"
     )
 )
+# a vote is created, changed and removed by one update of the title row, rating stats are derived from the histogram
 @pgtrigger.register(
     pgtrigger.Trigger(
         name="update_title_rating_on_user_vote",
-        operation=pgtrigger.Insert,
+        operation=pgtrigger.Insert | pgtrigger.Update | pgtrigger.Delete,
         when=pgtrigger.After,
+        declare=[("vote_title", "integer"), ("added", "integer"), ("removed", "integer")],
         func=
-        """
-        if EXISTS (SELECT 1 FROM title_titlerating WHERE title_id = NEW.title_id AND rating_id = NEW.rating_id ) then 
-            UPDATE title_titlerating
-            SET amount = amount + 1
-            WHERE title_id = NEW.title_id AND rating_id = NEW.rating_id;
-        ELSE
-            INSERT INTO title_titlerating (title_id, rating_id, amount)
-            values (NEW.title_id, NEW.rating_id, 1);
-        END IF;
-        RETURN NEW;
+        f"""
+        if TG_OP != 'INSERT' then
+            vote_title := OLD.title_id;
+            SELECT mark INTO removed FROM title_rating WHERE id = OLD.rating_id;
+        end if;
+        if TG_OP != 'DELETE' then
+            if vote_title is not null and vote_title != NEW.title_id then
+                {RATE_TITLE_SQL}
+                removed := null;
+            end if;
+            vote_title := NEW.title_id;
+            SELECT mark INTO added FROM title_rating WHERE id = NEW.rating_id;
+        end if;
+        if added is distinct from removed then
+            {RATE_TITLE_SQL}
+        end if;
+        RETURN NULL;
         """
     )
 )
@@ -411,6 +511,11 @@ class Team(models.Model):
         related_name="teams_of_title_through_chapter"
     )
 
+    class Meta:
+        indexes = [
+            GinIndex(OpClass(Lower("name"), name="gin_trgm_ops"), name="team_name_trgm_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         if self.picture:
@@ -427,18 +532,17 @@ class Team(models.Model):
         name="update_chapter_count_and_title_teams_on_insert",
         operation=pgtrigger.Insert,
         when=pgtrigger.After,
+        declare=[("team_chapters", "integer")],
         func=
         """
-        if not exists(select id from title_titleteam where title_id = new.title_id and team_id = new.team_id) then
-            insert into title_titleteam (title_id, team_id)
-            values (new.title_id, new.team_id);
-        end if;
-        if (select count(*) from title_chapter where team_id = new.team_id and title_id = new.title_id) =
-        (select chapter_count from title_title where id = new.title_id) + 1 then
-            update title_title
-            set chapter_count = chapter_count + 1
-            where id = new.title_id;
-        end if;
+        insert into title_titleteam (title_id, team_id, chapter_count)
+        values (new.title_id, new.team_id, 1)
+        on conflict (title_id, team_id) do update
+        set chapter_count = title_titleteam.chapter_count + 1
+        returning chapter_count into team_chapters;
+        update title_title
+        set chapter_count = team_chapters
+        where id = new.title_id and chapter_count < team_chapters;
         return null;
         """
     )
@@ -448,23 +552,90 @@ class Team(models.Model):
         name="update_chapter_count_on_chapter_delete",
         operation=pgtrigger.Delete,
         when=pgtrigger.After,
+        level=pgtrigger.Statement,
+        referencing=pgtrigger.Referencing(old="old_chapters"),
         func=
         """
+        update title_titleteam
+        set chapter_count = greatest(title_titleteam.chapter_count - deleted.chapters, 0)
+        from (
+            select title_id, team_id, count(*) as chapters
+            from old_chapters
+            group by title_id, team_id
+        ) as deleted
+        where title_titleteam.title_id = deleted.title_id and title_titleteam.team_id = deleted.team_id;
+        delete from title_titleteam
+        where chapter_count = 0 and title_id in (select distinct title_id from old_chapters);
         update title_title
         set chapter_count = (
-            select coalesce(max(team_chapters), 0)
+            select coalesce(max(chapter_count), 0)
+            from title_titleteam
+            where title_id = title_title.id
+        )
+        where id in (select distinct title_id from old_chapters);
+        return null;
+        """
+    )
+)
+@pgtrigger.register(
+    pgtrigger.Trigger(
+        name="update_title_likes_on_chapter_delete",
+        operation=pgtrigger.Delete,
+        when=pgtrigger.After,
+        level=pgtrigger.Statement,
+        referencing=pgtrigger.Referencing(old="old_chapters"),
+        func=
+        """
+        update title_title
+        set likes = greatest(title_title.likes - deleted.likes, 0)
         from (
-            select count(*) as team_chapters
-            from title_chapter
-            where title_id = old.title_id
-            group by team_id
-        ) as subquery)
-        where id = old.title_id;
-        if not exists(select id from title_chapter where title_id = old.title_id and team_id = old.team_id) then
-            delete from title_titleteam
-            where title_id = old.title_id and team_id = old.team_id;
-        end if;
-        return old;
+            select title_id, sum(likes) as likes
+            from old_chapters
+            group by title_id
+            having sum(likes) != 0
+        ) as deleted
+        where title_title.id = deleted.title_id;
+        return null;
+        """
+    )
+)
+@pgtrigger.register(
+    pgtrigger.Trigger(
+        # feed entries that held a deleted chapter are counted again from the published chapters left in their
+        # window, the latest of them becomes the entry chapter and an entry left without chapters goes
+        name="repair_feed_entries_on_chapter_delete",
+        operation=pgtrigger.Delete,
+        when=pgtrigger.After,
+        level=pgtrigger.Statement,
+        referencing=pgtrigger.Referencing(old="old_chapters"),
+        func=
+        """
+        update title_chapterfeedentry as entry
+        set chapter_id = remaining.chapter_id, chapters = remaining.chapters,
+            first_volume_number = remaining.first_volume_number, first_chapter_number = remaining.first_chapter_number
+        from (
+            select
+                affected.id,
+                count(*) as chapters,
+                (array_agg(chapter.id order by chapter.date_added desc, chapter.id desc))[1] as chapter_id,
+                (array_agg(chapter.volume_number order by chapter.volume_number, chapter.chapter_number))[1]
+                    as first_volume_number,
+                (array_agg(chapter.chapter_number order by chapter.volume_number, chapter.chapter_number))[1]
+                    as first_chapter_number
+            from (
+                select distinct entry.id, entry.title_id, entry.team_id, entry.started_at, entry.updated_at
+                from title_chapterfeedentry as entry
+                join old_chapters as old on old.title_id = entry.title_id and old.team_id = entry.team_id
+                    and old.is_published and old.date_added between entry.started_at and entry.updated_at
+            ) as affected
+            join title_chapter as chapter on chapter.title_id = affected.title_id and chapter.team_id = affected.team_id
+                and chapter.is_published and chapter.date_added between affected.started_at and affected.updated_at
+            group by affected.id
+        ) as remaining
+        where entry.id = remaining.id;
+        delete from title_chapterfeedentry
+        where chapter_id is null and title_id in (select distinct title_id from old_chapters);
+        return null;
         """
     )
 )
@@ -483,6 +654,7 @@ class Chapter(models.Model):
     image_archive = models.FileField(
         _("archive with chapter pages"), upload_to="titles/chapters", null=True, blank=False
     )
+    image_manifest = models.JSONField(_("archive pages manifest"), null=True, blank=True)
     user_likes = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
         through="ChapterLikes",
@@ -492,6 +664,12 @@ class Chapter(models.Model):
 
     class Meta:
         unique_together = ["volume_number", "chapter_number", "title", "team"]
+        indexes = [
+            # previous and next chapters of the reader
+            models.Index(
+                fields=["title", "team", "volume_number", "chapter_number"], name="chapter_reading_order_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title.name} - Том {self.volume_number} Глава {self.chapter_number}"
@@ -512,26 +690,172 @@ class CloudinaryImage(BaseCloudinaryField):
         return model_instance.image
 
 
+class ChapterImagesQuerySet(models.QuerySet):
+    def delete(self):
+        with transaction.atomic():
+            images = set(self.values_list("image", flat=True))
+            renditions = set(
+                ChapterImageVariant.objects.filter(image__in=self.values("id")).values_list("name", flat=True)
+            )
+            deleted = super().delete()
+            delete_pages_on_commit(images)
+            delete_renditions_on_commit(renditions)
+        return deleted
+
+
+def delete_pages_on_commit(names: set):
+    # unchanged pages are shared with the rows that replace them on chapter update,
+    # they're removed at once after the transaction commits and only if no row points to them anymore
+    def delete():
+        unused = names - set(ChapterImages.objects.filter(image__in=names).values_list("image", flat=True))
+        if unused:
+            page_storage().delete(list(unused))
+
+    if names:
+        transaction.on_commit(delete)
+
+
 class ChapterImages(models.Model):
     id = models.AutoField(primary_key=True)
     chapter = models.ForeignKey(
         Chapter, related_name="images_of_chapter", on_delete=models.CASCADE, blank=False, null=True
     )
-    image = CloudinaryImage()
+    # name of the page in the configured page storage
+    image = models.CharField(max_length=255, blank=False, null=False)
+    page = models.PositiveSmallIntegerField(_("page number"), default=0, blank=True, null=False)
+    content_hash = models.CharField(max_length=64, blank=True, null=True)
+
+    objects = ChapterImagesQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["chapter", "page"], name="chapter_images_page_idx"),
+        ]
+
+    def delete(self, *args, **kwargs):
+        return ChapterImages.objects.filter(id=self.id).delete()
 
 
-@receiver(pre_delete, sender=ChapterImages)
-def image_delete_on_delete(sender, instance, **kwargs):
-    if instance.image:
-        cloudinary.uploader.destroy(instance.image.public_id)
+@receiver(pre_delete, sender=Chapter)
+def chapter_images_delete_on_delete(sender, instance, **kwargs):
+    delete_renditions_on_commit(set(
+        ChapterImageVariant.objects.filter(image__chapter=instance).values_list("name", flat=True)
+    ))
+    # pages of a chapter are kept in its own folder, so they're removed at once instead of one request per page,
+    # after commit so a rolled back delete keeps its pages
+    storage = page_storage()
+    folders = {
+        storage.folder(image) for image in ChapterImages.objects.filter(chapter=instance).values_list("image", flat=True)
+    }
+
+    def delete():
+        for folder in folders:
+            storage.delete_folder(folder)
+
+    transaction.on_commit(delete)
 
 
 @receiver(pre_save, sender=ChapterImages)
 def image_delete_on_update(sender, instance, **kwargs):
     if instance.id:
-        ci = ChapterImages.objects.get(id=instance.id)
-        if ci.image:
-            cloudinary.uploader.destroy(ci.image.public_id)
+        image = ChapterImages.objects.filter(id=instance.id).values_list("image", flat=True).first()
+        if image and image != instance.image:
+            delete_pages_on_commit({image})
+
+
+class ChapterImageVariant(models.Model):
+    id = models.AutoField(primary_key=True)
+    image = models.ForeignKey(
+        ChapterImages, related_name="variants_of_image", on_delete=models.CASCADE, blank=False, null=False
+    )
+
+    class VariantFormat(models.TextChoices):
+        AVIF = "avif", _("AVIF")
+        WEBP = "webp", _("WebP")
+
+    format = models.CharField(max_length=4, choices=VariantFormat.choices, blank=False, null=False)
+    width = models.PositiveSmallIntegerField(blank=False, null=False)
+    height = models.PositiveIntegerField(blank=False, null=False)
+    name = models.CharField(max_length=150, blank=False, null=False)
+
+    class Meta:
+        unique_together = ["image", "format", "width"]
+
+
+def delete_renditions_on_commit(names: set):
+    # renditions are named by page content and may be shared between chapters,
+    # they're removed once the deleting transaction commits and no variant points to them anymore
+    def delete():
+        unused = names - set(ChapterImageVariant.objects.filter(name__in=names).values_list("name", flat=True))
+        if unused:
+            page_storage().delete(list(unused))
+
+    if names:
+        transaction.on_commit(delete)
+
+
+class ChapterUploadJob(models.Model):
+    id = models.AutoField(primary_key=True)
+    chapter = models.ForeignKey(
+        Chapter, related_name="upload_jobs_of_chapter", on_delete=models.CASCADE, blank=False, null=False
+    )
+    archive = models.CharField(_("archive name"), max_length=100, blank=False, null=False)
+    created_at = models.DateTimeField(auto_now_add=True, blank=True, null=False)
+
+    class Meta:
+        unique_together = ["chapter", "archive"]
+
+    def __str__(self):
+        return f"{self.chapter_id}: {self.archive}"
+
+
+class ChapterUploadPage(models.Model):
+    id = models.AutoField(primary_key=True)
+    job = models.ForeignKey(
+        ChapterUploadJob, related_name="pages_of_job", on_delete=models.CASCADE, blank=False, null=False
+    )
+    content_hash = models.CharField(max_length=64, blank=False, null=False)
+    image = models.CharField(max_length=255, blank=False, null=False)
+
+    class Meta:
+        unique_together = ["job", "content_hash"]
+
+
+class ChapterFeedEntry(models.Model):
+    # chapters a team publishes for a title in a burst are shown as one entry of the latest chapters feed
+    id = models.AutoField(primary_key=True)
+    title = models.ForeignKey(
+        Title, related_name="feed_entries_of_title", on_delete=models.CASCADE, blank=False, null=False
+    )
+    team = models.ForeignKey(
+        Team, related_name="feed_entries_of_team", on_delete=models.CASCADE, blank=False, null=False
+    )
+    # null only until the chapter delete trigger repairs the entry
+    chapter = models.ForeignKey(
+        Chapter, related_name="feed_entries_of_chapter", on_delete=models.SET_NULL, blank=False, null=True
+    )
+    chapters = models.PositiveIntegerField(_("chapters"), default=1, blank=True, null=False)
+    first_volume_number = models.PositiveSmallIntegerField(blank=False, null=False)
+    first_chapter_number = models.FloatField(blank=False, null=False)
+    # the entry window, chapters of its title and team added from started_at up to updated_at belong to it
+    started_at = models.DateTimeField(blank=False, null=False)
+    updated_at = models.DateTimeField(blank=False, null=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="title_feed_keyset_idx"),
+            models.Index(fields=["title", "team", "updated_at"], name="title_feed_group_idx"),
+        ]
+
+
+class ChapterLikeDelta(models.Model):
+    # likes are appended here instead of updating the chapter row, so concurrent likes of a chapter don't queue
+    # on its lock, flush_chapter_likes folds them into chapter and title likes and title activity
+    id = models.BigAutoField(primary_key=True)
+    # not a foreign key, deltas of deleted chapters are dropped by the next flush
+    chapter_id = models.IntegerField(blank=False, null=False)
+    liked_at = models.DateTimeField(blank=False, null=False)
+    delta = models.SmallIntegerField(blank=False, null=False)
 
 
 @pgtrigger.register(
@@ -541,9 +865,8 @@ def image_delete_on_update(sender, instance, **kwargs):
         when=pgtrigger.After,
         func=
         """
-        UPDATE title_chapter
-        SET likes = likes - 1
-        WHERE id = OLD.chapter_id;
+        INSERT INTO title_chapterlikedelta (chapter_id, liked_at, delta)
+        VALUES (OLD.chapter_id, OLD.date_added, -1);
         RETURN NULL;
         """
     )
@@ -555,9 +878,8 @@ def image_delete_on_update(sender, instance, **kwargs):
         when=pgtrigger.After,
         func=
         """
-        UPDATE title_chapter
-        SET likes = likes + 1
-        WHERE id = NEW.chapter_id;
+        INSERT INTO title_chapterlikedelta (chapter_id, liked_at, delta)
+        VALUES (NEW.chapter_id, NEW.date_added, 1);
         RETURN NEW;
         """
     )
@@ -575,3 +897,39 @@ class ChapterLikes(models.Model):
 
     def __str__(self):
         return f"{self.user.username} liked {self.chapter.name}"
+
+
+class TitleActivity(models.Model):
+    # events of the last hours are counted per hour, older ones per day
+    id = models.BigAutoField(primary_key=True)
+    title = models.ForeignKey(
+        Title, related_name="activity_of_title", on_delete=models.CASCADE, blank=False, null=False
+    )
+    bucket = models.DateTimeField(_("bucket start"), blank=False, null=False)
+    daily = models.BooleanField(default=False, blank=True, null=False)
+    likes = models.PositiveIntegerField(default=0, blank=True, null=False)
+    ratings = models.PositiveIntegerField(default=0, blank=True, null=False)
+    list_adds = models.PositiveIntegerField(default=0, blank=True, null=False)
+    comments = models.PositiveIntegerField(default=0, blank=True, null=False)
+
+    class Meta:
+        unique_together = ["title", "bucket", "daily"]
+        indexes = [
+            models.Index(fields=["bucket"], name="title_activity_bucket_idx"),
+        ]
+
+
+class TitleTrending(models.Model):
+    title = models.OneToOneField(
+        Title, related_name="trending_of_title", on_delete=models.CASCADE, primary_key=True
+    )
+    popular = models.FloatField(_("popularity"), default=0, blank=True, null=False)
+    weekly = models.FloatField(_("trending this week"), default=0, blank=True, null=False)
+    likes = models.PositiveIntegerField(_("recent likes"), default=0, blank=True, null=False)
+    updated_at = models.DateTimeField(blank=False, null=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-popular"], name="title_trending_popular_idx"),
+            models.Index(fields=["-weekly"], name="title_trending_weekly_idx"),
+        ]
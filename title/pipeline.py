@@ -0,0 +1,94 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from hashlib import sha256
+from threading import Condition
+from zipfile import ZipFile, BadZipFile
+from django.conf import settings
+from natsort import os_sorted
+from .storage import page_storage
+
+UploadedPage = namedtuple("UploadedPage", ("content_hash", "image", "renditions"), defaults=(None,))
+
+
+class InFlightLimiter:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.condition = Condition()
+
+    def acquire(self, size: int):
+        with self.condition:
+            # a page bigger than the limit is still let through once nothing else is in flight
+            self.condition.wait_for(lambda: self.in_flight == 0 or self.in_flight + size <= self.max_bytes)
+            self.in_flight += size
+
+    def release(self, size: int):
+        with self.condition:
+            self.in_flight -= size
+            self.condition.notify_all()
+
+
+def archive_pages(archive: ZipFile) -> list:
+    return os_sorted(archive.namelist())
+
+
+def upload_archive_images(image_archive, folder: str, storage=None, workers: int = None,
+                          max_in_flight_bytes: int = None, uploaded: dict = None, on_uploaded=None,
+                          manifest: list = None, render=None) -> list:
+    storage = storage or page_storage()
+    workers = workers or settings.CHAPTER_UPLOAD_WORKERS
+    limiter = InFlightLimiter(max_in_flight_bytes or settings.CHAPTER_UPLOAD_MAX_IN_FLIGHT_BYTES)
+    # content hash -> image of every page that doesn't need to be uploaded again
+    uploaded = dict(uploaded or {})
+    renditions = {}
+    pending = {}
+
+    def process_page(content_hash: str, data: bytes, size: int):
+        try:
+            image = uploaded.get(content_hash) or storage.save(data, folder)
+            return image, render(content_hash, data) if render else None
+        finally:
+            limiter.release(size)
+
+    def checkpoint(future):
+        content_hash = pending.pop(future)
+        image, renditions[content_hash] = future.result()
+        if content_hash not in uploaded:
+            uploaded[content_hash] = image
+            if on_uploaded:
+                on_uploaded(content_hash, image)
+
+    with ZipFile(image_archive, "r") as archive, ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            hashes = []
+            # the manifest built during validation already holds page order, so the archive isn't re-scanned
+            for page in manifest or [{"name": name} for name in archive_pages(archive)]:
+                info = archive.getinfo(page["name"])
+                if page.get("offset", info.header_offset) != info.header_offset:
+                    raise BadZipFile(f"{page['name']} doesn't match the archive manifest")
+                size = info.file_size
+                limiter.acquire(size)
+                try:
+                    data = archive.read(info)
+                except BaseException:
+                    limiter.release(size)
+                    raise
+                content_hash = sha256(data).hexdigest()
+                hashes.append(content_hash)
+                # already uploaded pages still go through the pool when their renditions are needed
+                if (content_hash in uploaded and not render) or content_hash in pending.values() \
+                        or content_hash in renditions:
+                    limiter.release(size)
+                    continue
+                pending[executor.submit(process_page, content_hash, data, size)] = content_hash
+                for future in [future for future in pending if future.done()]:
+                    checkpoint(future)
+            for future in as_completed(list(pending)):
+                checkpoint(future)
+            return [
+                UploadedPage(content_hash, uploaded[content_hash], renditions.get(content_hash))
+                for content_hash in hashes
+            ]
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
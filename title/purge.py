@@ -0,0 +1,89 @@
+from itertools import chain
+from django.db import connection, transaction
+from .cache import CHAPTERS, CATALOGUE, title_tag, chapter_list_tag, invalidate
+from .documents import stale_title_documents
+from .models import Title, Chapter, ChapterImages, ChapterImageVariant, ChapterUploadPage, Team
+from .storage import page_storage
+
+PURGE_BATCH_SIZE = 500
+
+# dependent rows go first, chapter_count and TitleTeam are recomputed once per statement by the chapter delete trigger
+PURGE_STATEMENTS = [
+    """
+    DELETE FROM title_chapterimagevariant
+    WHERE image_id IN (SELECT id FROM title_chapterimages WHERE chapter_id = ANY(%(chapters)s))
+    """,
+    "DELETE FROM title_chapterimages WHERE chapter_id = ANY(%(chapters)s)",
+    """
+    DELETE FROM title_chapteruploadpage
+    WHERE job_id IN (SELECT id FROM title_chapteruploadjob WHERE chapter_id = ANY(%(chapters)s))
+    """,
+    "DELETE FROM title_chapteruploadjob WHERE chapter_id = ANY(%(chapters)s)",
+    "DELETE FROM title_chapterlikes WHERE chapter_id = ANY(%(chapters)s)",
+    "UPDATE title_chapterfeedentry SET chapter_id = NULL WHERE chapter_id = ANY(%(chapters)s)",
+    "DELETE FROM social_notification WHERE chapter_id = ANY(%(chapters)s)",
+    "DELETE FROM title_chapter WHERE id = ANY(%(chapters)s)",
+]
+
+
+def chapter_assets(chapter_ids: list) -> tuple:
+    storage = page_storage()
+    folders = {
+        storage.folder(image) for image in chain(
+            ChapterImages.objects.filter(chapter_id__in=chapter_ids).values_list("image", flat=True),
+            ChapterUploadPage.objects.filter(job__chapter_id__in=chapter_ids).values_list("image", flat=True)
+        )
+    }
+    # renditions are content addressed, so the ones shared with other chapters are kept
+    renditions = set(
+        ChapterImageVariant.objects.filter(image__chapter_id__in=chapter_ids).exclude(
+            name__in=ChapterImageVariant.objects.exclude(image__chapter_id__in=chapter_ids).values("name")
+        ).values_list("name", flat=True)
+    )
+    archives = set(
+        Chapter.objects.filter(id__in=chapter_ids).exclude(image_archive="").exclude(
+            image_archive__isnull=True
+        ).values_list("image_archive", flat=True)
+    )
+    return folders, renditions, archives
+
+
+def delete_chapter_assets(folders: set, renditions: set, archives: set):
+    storage = page_storage()
+    for folder in folders:
+        storage.delete_folder(folder)
+    if renditions:
+        storage.delete(list(renditions))
+    storage = Chapter._meta.get_field("image_archive").storage
+    for name in archives:
+        storage.delete(name)
+
+
+# unlike Model.delete() no per row signals are sent, remote assets are removed per chapter folder
+def purge_chapters(chapter_ids: list, progress=None) -> int:
+    chapter_ids = list(chapter_ids)
+    for start in range(0, len(chapter_ids), PURGE_BATCH_SIZE):
+        batch = chapter_ids[start:start + PURGE_BATCH_SIZE]
+        assets = chapter_assets(batch)
+        titles = list(Title.objects.filter(chapters_of_title__in=batch).values_list("id", "slug").distinct())
+        chapter_lists = set(Chapter.objects.filter(id__in=batch).values_list("title_id", "team_id"))
+        with transaction.atomic(), connection.cursor() as cursor:
+            stale_title_documents(title_id__in=[title_id for title_id, _ in titles])
+            invalidate(
+                CHAPTERS, CATALOGUE,
+                *[title_tag(slug) for _, slug in titles],
+                *[chapter_list_tag(title_id, team_id) for title_id, team_id in chapter_lists]
+            )
+            for statement in PURGE_STATEMENTS:
+                cursor.execute(statement, {"chapters": batch})
+        # remote assets are only removed once rows pointing to them are gone
+        delete_chapter_assets(*assets)
+        if progress:
+            progress(start + len(batch), len(chapter_ids))
+    return len(chapter_ids)
+
+
+def purge_team(team: Team, progress=None) -> int:
+    purged = purge_chapters(Chapter.objects.filter(team=team).values_list("id", flat=True), progress)
+    team.delete()
+    return purged
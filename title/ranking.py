@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+# bayesian average: every title starts with prior votes at the mean mark of all votes,
+# votes keep the ranking of their title up to date with the stored prior, so the prior is only stored again
+# and every ranking recomputed once the mean drifts away from it
+UPDATE_PRIOR_SQL = """
+    insert into title_titlerankingprior (id, mean, votes)
+    select 1, coalesce(sum(rating_sum)::float8 / nullif(sum(votes), 0), 0), %(prior_votes)s
+    from title_title
+    on conflict (id) do update
+    set mean = excluded.mean, votes = excluded.votes
+    where %(force)s or abs(title_titlerankingprior.mean - excluded.mean) > %(drift)s
+        or title_titlerankingprior.votes != excluded.votes
+"""
+# only titles whose ranking changed are written
+UPDATE_RANKINGS_SQL = """
+    with rankings as (
+        select title_title.id,
+            (prior.mean * prior.votes + rating_sum) / greatest(prior.votes + votes, 1) as ranking
+        from title_title, title_titlerankingprior as prior
+    )
+    update title_title
+    set ranking = rankings.ranking
+    from rankings
+    where title_title.id = rankings.id and title_title.ranking is distinct from rankings.ranking
+"""
+
+
+def update_title_rankings(force: bool = False) -> int:
+    # number of titles whose ranking changed
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(UPDATE_PRIOR_SQL, {
+            "prior_votes": float(settings.TITLE_RANKING_PRIOR_VOTES),
+            "drift": settings.TITLE_RANKING_PRIOR_DRIFT,
+            "force": force
+        })
+        if not cursor.rowcount:
+            return 0
+        cursor.execute(UPDATE_RANKINGS_SQL)
+        return cursor.rowcount
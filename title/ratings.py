@@ -0,0 +1,26 @@
+from django.db import connection, transaction
+from .cache import CATALOGUE, title_tag, invalidate
+from .documents import stale_title_documents
+from .models import Title
+
+# a repeated vote only changes the mark, the title histogram is updated by the vote trigger
+VOTE_SQL = """
+    insert into title_usertitlerating (user_id, title_id, rating_id)
+    select %(user)s, %(title)s, id from title_rating where mark = %(mark)s
+    on conflict (user_id, title_id) do update
+    set rating_id = excluded.rating_id
+    returning id
+"""
+
+
+def rate_title(user_id: int, title_id, mark) -> bool:
+    # False for an unknown mark, IntegrityError for an unknown title
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(VOTE_SQL, {"user": user_id, "title": title_id, "mark": mark})
+        if cursor.fetchone() is None:
+            return False
+        stale_title_documents(title_id=title_id)
+        invalidate(
+            CATALOGUE, *[title_tag(slug) for slug in Title.objects.filter(id=title_id).values_list("slug", flat=True)]
+        )
+    return True
@@ -0,0 +1,77 @@
+from collections import namedtuple
+from io import BytesIO
+from django.conf import settings
+from PIL import Image
+from .storage import page_storage
+
+try:
+    # registers the AVIF plugin when it's installed
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+Rendition = namedtuple("Rendition", ("format", "width", "height", "name"))
+
+RENDITION_FORMATS = {
+    "avif": "AVIF",
+    "webp": "WEBP",
+}
+
+
+def available_formats() -> list:
+    Image.init()
+    return [image_format for image_format, plugin in RENDITION_FORMATS.items() if plugin in Image.SAVE]
+
+
+def rendition_name(content_hash: str, width: int, image_format: str) -> str:
+    return f"titles/pages/{content_hash[:2]}/{content_hash}_{width}.{image_format}"
+
+
+def rendition_widths(width: int) -> list:
+    # pages are never upscaled, the original width is always kept
+    return sorted({w for w in settings.CHAPTER_PAGE_WIDTHS if w < width} | {width})
+
+
+def render_page(content_hash: str, data: bytes, storage=None) -> list:
+    # renditions are named by page content and kept in the page storage, so every worker finds them
+    # and unchanged and retried pages aren't encoded twice
+    storage = storage or page_storage()
+    formats = available_formats()
+    renditions = []
+    encoded = []
+    try:
+        with Image.open(BytesIO(data)) as image:
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            for width in rendition_widths(image.width):
+                height = round(image.height * width / image.width)
+                resized = None
+                for image_format in formats:
+                    name = rendition_name(content_hash, width, image_format)
+                    if not storage.exists(name):
+                        if resized is None:
+                            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                        buffer = BytesIO()
+                        try:
+                            resized.save(buffer, RENDITION_FORMATS[image_format], quality=settings.CHAPTER_PAGE_QUALITY)
+                        except (OSError, ValueError):
+                            # e.g. long webtoon strips exceed the maximum webp dimensions
+                            continue
+                        encoded.append((len(renditions), buffer.getvalue()))
+                    renditions.append(Rendition(image_format, width, height, name))
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # pages that can't be decoded are served as uploaded
+        return []
+    # storage errors aren't decoding errors, they're raised to the upload task
+    for position, content in encoded:
+        # a concurrent worker may have saved the same rendition first, the name actually saved is kept
+        renditions[position] = renditions[position]._replace(name=storage.save_as(content, renditions[position].name))
+    return renditions
+
+
+def srcset(renditions: list, storage=None) -> dict:
+    storage = storage or page_storage()
+    sets = {}
+    for rendition in sorted(renditions, key=lambda r: r.width):
+        sets.setdefault(rendition.format, []).append(f"{storage.url(rendition.name)} {rendition.width}w")
+    return {image_format: ", ".join(candidates) for image_format, candidates in sets.items()}
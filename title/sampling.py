@@ -0,0 +1,50 @@
+from random import choice, randint
+from typing import Optional
+from django.db.models import Max, Min
+from .columnar import catalogue_index, match_title_ids, np
+
+# candidates checked by one query, and the exact id probes tried before falling back to the next id
+PROBE_BATCH = 64
+PROBE_ATTEMPTS = 8
+
+
+def random_title_id(filterset) -> Optional[int]:
+    title_ids = match_title_ids(filterset)
+    if title_ids is not None:
+        return int(choice(title_ids)) if len(title_ids) else None
+    if np is not None:
+        return sample_index_ids(filterset.qs)
+    return probe_ids(filterset.qs)
+
+
+def sample_index_ids(queryset) -> Optional[int]:
+    # ids of the catalogue index are taken in a random order and checked a batch at a time by primary key, a title
+    # picked at random among the matching ones of a random batch is as likely as any other; titles deleted since the
+    # index was loaded just don't match, titles added since wait for its refresh
+    title_ids = catalogue_index().id
+    order = np.random.permutation(len(title_ids))
+    start, size = 0, PROBE_BATCH
+    while start < len(order):
+        batch = title_ids[order[start:start + size]].tolist()
+        matching = list(queryset.filter(id__in=batch).values_list("id", flat=True))
+        if matching:
+            return choice(matching)
+        # a selective filter is swept with growing batches, so having no match is found in a few queries
+        start, size = start + size, size * 4
+    return None
+
+
+def probe_ids(queryset) -> Optional[int]:
+    # without numpy random ids are probed by primary key, exact hits keep titles equally likely and after a few
+    # misses the next matching id is taken, which favours titles after gaps in the ids and filtered out runs;
+    # the bounds of all titles come from the ends of the primary key index
+    bounds = queryset.model.objects.aggregate(low=Min("id"), high=Max("id"))
+    if bounds["low"] is None:
+        return None
+    for _ in range(PROBE_ATTEMPTS):
+        title_id = queryset.filter(id=randint(bounds["low"], bounds["high"])).values_list("id", flat=True).first()
+        if title_id is not None:
+            return title_id
+    title_id = randint(bounds["low"], bounds["high"])
+    ids = queryset.order_by("id").values_list("id", flat=True)
+    return ids.filter(id__gte=title_id).first() or ids.filter(id__lt=title_id).first()
@@ -0,0 +1,24 @@
+from django.contrib.postgres.search import SearchQuery, TrigramWordSimilarity
+from django.db.models import F, Q
+from typing import Optional
+
+SEARCH_CONFIG = "simple"
+
+
+def is_fuzzy(query_params) -> bool:
+    return str(query_params.get("fuzzy", "")).lower() in ("1", "true")
+
+
+def search(queryset, value: str, document=F("search_document"), vector: Optional[str] = None, fuzzy=False, rank=True):
+    value = value.lower()
+    queryset = queryset.alias(document=document)
+    if fuzzy:
+        condition = Q(document__trigram_word_similar=value)
+    else:
+        condition = Q(document__contains=value)
+        if vector:
+            condition |= Q(**{vector: SearchQuery(value, config=SEARCH_CONFIG)})
+    queryset = queryset.filter(condition)
+    if rank:
+        queryset = queryset.annotate(similarity=TrigramWordSimilarity(value, "document")).order_by("-similarity", "id")
+    return queryset
@@ -1,8 +1,8 @@
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from .models import (
-    Title, ReleaseFormat, Rating, Publisher, Person, Keyword, TitleRating, TitlePerson, UserTitleRating,
-    Chapter, Team, TeamParticipant
+    Title, ReleaseFormat, Publisher, Person, Keyword, TitlePerson, UserTitleRating,
+    Chapter, Team, TeamParticipant, ChapterFeedEntry
 )
 from django.apps import apps
 
@@ -87,7 +87,7 @@ class PublisherSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Publisher
-        fields = "__all__"
+        exclude = ("search_document", "search_vector")
 
 
 class PersonSerializer(serializers.ModelSerializer):
@@ -96,7 +96,7 @@ class PersonSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Person
-        fields = "__all__"
+        exclude = ("search_document", "search_vector")
 
 
 class KeywordSerializer(serializers.ModelSerializer):
@@ -105,18 +105,13 @@ class KeywordSerializer(serializers.ModelSerializer):
         fields = ("type", "slug", "name")
 
 
-class RatingSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Rating
-        fields = ("mark",)
-
-
-class TitleRatingSerializer(serializers.ModelSerializer):
-    rating = RatingSerializer()
-
-    class Meta:
-        model = TitleRating
-        fields = ("rating", "amount")
+class RatingHistogramField(serializers.Field):
+    # votes per mark as a list of marks with votes, highest mark first
+    def to_representation(self, histogram):
+        return [
+            {"rating": {"mark": mark}, "amount": amount}
+            for mark, amount in reversed(list(enumerate(histogram))) if amount
+        ]
 
 
 class PublisherTitleSerializer(serializers.ModelSerializer):
@@ -160,15 +155,14 @@ class TitleDetailsSerializer(serializers.ModelSerializer):
     publisher = PublisherTitleSerializer(many=True)
     person = TitlePersonSerializer(source="persons_of_title", many=True)
     keywords = KeywordSerializer(many=True)
-    title_rating = TitleRatingSerializer(source="ratings_of_title", many=True)
-    likes = serializers.IntegerField()
+    title_rating = RatingHistogramField(source="rating_histogram", read_only=True)
     chapter_count = serializers.IntegerField()
     teams = TitleTeamSerializer(many=True)
     subscribed = serializers.BooleanField()
 
     class Meta:
         model = Title
-        fields = "__all__"
+        exclude = ("search_document", "search_vector", "rating_histogram", "ranking")
 
 
 class TitleListSerializer(serializers.ModelSerializer):
@@ -196,14 +190,6 @@ class RateTitleSerializer(serializers.ModelSerializer):
         fields = ("title", "rating")
 
 
-class ChapterSerializer(serializers.ModelSerializer):
-    liked_by_user = serializers.BooleanField()
-
-    class Meta:
-        model = Chapter
-        fields = ("id", "volume_number", "chapter_number", "name", "date_added", "likes", "liked_by_user")
-
-
 class ChapterAnonymousSerializer(serializers.ModelSerializer):
     class Meta:
         model = Chapter
@@ -223,12 +209,20 @@ class ChapterTitleSerializer(serializers.ModelSerializer):
 
 
 class LatestChaptersSerializer(serializers.ModelSerializer):
+    # an entry shows its latest chapter, chapters counts the ones grouped with it
     title = ChapterTitleSerializer()
     team = ChapterTeamSerializer()
+    name = serializers.CharField(source="chapter.name")
+    volume_number = serializers.IntegerField(source="chapter.volume_number")
+    chapter_number = serializers.FloatField(source="chapter.chapter_number")
+    date_added = serializers.DateTimeField(source="updated_at")
 
     class Meta:
-        model = Chapter
-        fields = ("title", "name", "volume_number", "chapter_number", "date_added", "team")
+        model = ChapterFeedEntry
+        fields = (
+            "title", "name", "volume_number", "chapter_number", "date_added", "team", "chapters",
+            "first_volume_number", "first_chapter_number"
+        )
 
 
 class InviteToTeamSerializer(serializers.ModelSerializer):
@@ -288,7 +282,8 @@ class TeamSearchSerializer(serializers.ModelSerializer):
 
 class PopularNowTitlesSerializer(serializers.ModelSerializer):
     title_type = ChoiceField(choices=Title.TitleType.choices)
-    likes = serializers.IntegerField()
+    # likes of the last 30 days rather than the title's total
+    likes = serializers.IntegerField(source="recent_likes")
 
     class Meta:
         model = Title
@@ -354,20 +349,25 @@ class ChapterDetailTeamSerializer(serializers.ModelSerializer):
         fields = ("name", "slug", "picture")
 
 
-class CloudinaryField(serializers.Field):
-    def to_representation(self, value):
-        return value.url
-
-
 class ChapterDetailSerializer(serializers.ModelSerializer):
     title = ChapterDetailTitleSerializer(many=False)
     team = ChapterDetailTeamSerializer(many=False)
-    images = serializers.ListField(child=CloudinaryField())
+    images = serializers.SerializerMethodField()
+    pages = serializers.ListField(child=serializers.DictField())
+    previous = serializers.DictField(allow_null=True)
+    next = serializers.DictField(allow_null=True)
+    prefetch = serializers.ListField(child=serializers.DictField())
     liked_by_user = serializers.BooleanField()
 
     class Meta:
         model = Chapter
-        fields = ("id", "title", "team", "volume_number", "chapter_number", "name", "images", "liked_by_user")
+        fields = (
+            "id", "title", "team", "volume_number", "chapter_number", "name", "images", "pages", "previous", "next",
+            "prefetch", "liked_by_user"
+        )
+
+    def get_images(self, obj):
+        return [page["image"] for page in obj.pages]
 
 
 class AllTitleTeamChaptersSerializer(serializers.ModelSerializer):
@@ -0,0 +1,102 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from .cache import TITLES, CHAPTERS, FILTERS, CATALOGUE, title_tag, chapter_list_tag, invalidate
+from .documents import stale_title_documents
+from .models import (
+    Title, Chapter, Keyword, ReleaseFormat, Person, Publisher, Team, TitlePerson, TitlePublisher, UserTitleRating
+)
+
+# lookups of titles whose documents show an entity
+TITLE_LOOKUPS = {
+    Keyword: "title__keywords",
+    ReleaseFormat: "title__release_format",
+    Person: "title__persons_of_title__person",
+    Publisher: "title__publisher",
+    Team: "title__teams",
+}
+
+
+def invalidate_title(title_id: int, *tags):
+    stale_title_documents(title_id=title_id)
+    invalidate(*tags, *[title_tag(slug) for slug in Title.objects.filter(id=title_id).values_list("slug", flat=True)])
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def invalidate_title_on_change(sender, instance, **kwargs):
+    stale_title_documents(title_id=instance.id)
+    slugs = {instance.slug, instance.tracker.previous("slug")} - {None}
+    invalidate(TITLES, CATALOGUE, *[title_tag(slug) for slug in slugs])
+
+
+@receiver(m2m_changed, sender=Title.keywords.through)
+@receiver(m2m_changed, sender=Title.release_format.through)
+def invalidate_title_on_relation_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_title(instance.id, CATALOGUE)
+        return
+    # changes made from the keyword or release format side may touch any title
+    if pk_set is None:
+        stale_title_documents()
+    else:
+        stale_title_documents(title_id__in=pk_set)
+    invalidate(TITLES, CATALOGUE)
+
+
+@receiver(post_save, sender=TitlePerson)
+@receiver(post_delete, sender=TitlePerson)
+@receiver(post_save, sender=TitlePublisher)
+@receiver(post_delete, sender=TitlePublisher)
+def invalidate_title_on_related_change(sender, instance, **kwargs):
+    invalidate_title(instance.title_id)
+
+
+@receiver(post_save, sender=UserTitleRating)
+@receiver(post_delete, sender=UserTitleRating)
+def invalidate_title_on_rating(sender, instance, **kwargs):
+    invalidate_title(instance.title_id, CATALOGUE)
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def invalidate_chapters_on_change(sender, instance, **kwargs):
+    invalidate_title(instance.title_id, CHAPTERS, CATALOGUE, chapter_list_tag(instance.title_id, instance.team_id))
+
+
+@receiver(post_save, sender=Keyword)
+@receiver(post_save, sender=ReleaseFormat)
+@receiver(post_save, sender=Person)
+@receiver(post_save, sender=Publisher)
+@receiver(post_save, sender=Team)
+def stale_documents_on_change(sender, instance, **kwargs):
+    stale_title_documents(**{TITLE_LOOKUPS[sender]: instance})
+
+
+# titles are looked up before the relations are deleted along with the entity
+@receiver(pre_delete, sender=Keyword)
+@receiver(pre_delete, sender=ReleaseFormat)
+@receiver(pre_delete, sender=Person)
+@receiver(pre_delete, sender=Publisher)
+@receiver(pre_delete, sender=Team)
+def stale_documents_on_delete(sender, instance, **kwargs):
+    stale_title_documents(**{TITLE_LOOKUPS[sender]: instance})
+
+
+@receiver(post_save, sender=Keyword)
+@receiver(post_delete, sender=Keyword)
+@receiver(post_save, sender=ReleaseFormat)
+@receiver(post_delete, sender=ReleaseFormat)
+def invalidate_filters_on_change(sender, instance, **kwargs):
+    invalidate(FILTERS, TITLES, CATALOGUE)
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+@receiver(post_save, sender=Publisher)
+@receiver(post_delete, sender=Publisher)
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def invalidate_titles_on_change(sender, instance, **kwargs):
+    invalidate(TITLES, CHAPTERS)
@@ -0,0 +1,163 @@
+from abc import ABC, abstractmethod
+from os.path import dirname, splitext
+from threading import Lock
+from uuid import uuid4
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.module_loading import import_string
+from cloudinary import api, uploader, CloudinaryResource
+from cloudinary.models import CLOUDINARY_FIELD_DB_RE
+import re
+import shutil
+import time
+
+# the admin API accepts up to 100 public ids per delete request
+CLOUDINARY_DELETE_BATCH_SIZE = 100
+
+
+def page_storage():
+    return import_string(settings.CHAPTER_PAGE_STORAGE)()
+
+
+def page_extension(data: bytes) -> str:
+    return "png" if data.startswith(b"\x89PNG") else "jpg"
+
+
+# pages are saved under chapter folders, the returned names are kept in ChapterImages.image
+class PageStorage(ABC):
+    @abstractmethod
+    def save(self, data: bytes, folder: str) -> str:
+        pass
+
+    # content addressed files, e.g. page renditions, are saved under their own name and never overwritten,
+    # the returned name is the one to keep
+    @abstractmethod
+    def save_as(self, data: bytes, name: str) -> str:
+        pass
+
+    @abstractmethod
+    def exists(self, name: str) -> bool:
+        pass
+
+    @abstractmethod
+    def url(self, name: str) -> str:
+        pass
+
+    def folder(self, name: str) -> str:
+        return dirname(name)
+
+    @abstractmethod
+    def delete(self, names: list):
+        pass
+
+    @abstractmethod
+    def delete_folder(self, folder: str):
+        pass
+
+
+class CloudinaryPageStorage(PageStorage):
+    @staticmethod
+    def resource(name: str) -> CloudinaryResource:
+        match = re.match(CLOUDINARY_FIELD_DB_RE, name)
+        return CloudinaryResource(
+            type=match.group("type") or "upload",
+            resource_type=match.group("resource_type") or "image",
+            version=match.group("version"),
+            public_id=match.group("public_id"),
+            format=match.group("format")
+        )
+
+    def save(self, data: bytes, folder: str) -> str:
+        return uploader.upload_image(data, folder=folder, unique_filename=True, quality="auto:eco").get_prep_value()
+
+    def save_as(self, data: bytes, name: str) -> str:
+        # an existing asset is returned as is instead of being uploaded again
+        return uploader.upload_image(data, public_id=splitext(name)[0], overwrite=False).get_prep_value()
+
+    def exists(self, name: str) -> bool:
+        # checking would take an admin API request per name, save_as already keeps existing assets
+        return False
+
+    def url(self, name: str) -> str:
+        return self.resource(name).url
+
+    def folder(self, name: str) -> str:
+        return dirname(self.resource(name).public_id)
+
+    def delete(self, names: list):
+        public_ids = [self.resource(name).public_id for name in names]
+        for start in range(0, len(public_ids), CLOUDINARY_DELETE_BATCH_SIZE):
+            api.delete_resources(public_ids[start:start + CLOUDINARY_DELETE_BATCH_SIZE])
+
+    def delete_folder(self, folder: str):
+        # a single request deletes up to a thousand resources and reports the rest as partial
+        while api.delete_resources_by_prefix(f"{folder}/").get("partial"):
+            pass
+
+
+class FileSystemPageStorage(PageStorage):
+    def __init__(self, location: str = None, base_url: str = None):
+        self.storage = FileSystemStorage(location=location, base_url=base_url)
+
+    def save(self, data: bytes, folder: str) -> str:
+        return self.storage.save(f"{folder}/{uuid4().hex}.{page_extension(data)}", ContentFile(data))
+
+    def save_as(self, data: bytes, name: str) -> str:
+        # a name taken by a concurrent save gets a suffix, that file is the one to keep then
+        return name if self.storage.exists(name) else self.storage.save(name, ContentFile(data))
+
+    def exists(self, name: str) -> bool:
+        return self.storage.exists(name)
+
+    def url(self, name: str) -> str:
+        return self.storage.url(name)
+
+    def delete(self, names: list):
+        for name in names:
+            self.storage.delete(name)
+
+    def delete_folder(self, folder: str):
+        shutil.rmtree(self.storage.path(folder), ignore_errors=True)
+
+
+class InMemoryPageStorage(PageStorage):
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.files = {}
+        self.requests = 0
+        self.lock = Lock()
+
+    def save(self, data: bytes, folder: str) -> str:
+        time.sleep(self.latency)
+        name = f"{folder}/{uuid4().hex}.{page_extension(data)}"
+        with self.lock:
+            self.files[name] = data
+            self.requests += 1
+        return name
+
+    def save_as(self, data: bytes, name: str) -> str:
+        time.sleep(self.latency)
+        with self.lock:
+            self.files.setdefault(name, data)
+            self.requests += 1
+        return name
+
+    def exists(self, name: str) -> bool:
+        with self.lock:
+            return name in self.files
+
+    def url(self, name: str) -> str:
+        return f"memory://{name}"
+
+    def delete(self, names: list):
+        with self.lock:
+            for name in names:
+                self.files.pop(name, None)
+            self.requests += 1
+
+    def delete_folder(self, folder: str):
+        with self.lock:
+            for name in [name for name in self.files if name.startswith(f"{folder}/")]:
+                del self.files[name]
+            self.requests += 1
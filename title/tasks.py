@@ -1,10 +1,22 @@
 from django.db import IntegrityError, transaction
 from django.apps import apps
+from django.conf import settings
 from celery import shared_task
-from .models import Chapter, ChapterImages, Team
-from zipfile import ZipFile
-from natsort import os_sorted
-from cloudinary import uploader
+from .models import Chapter, ChapterImages, ChapterImageVariant, Team, ChapterUploadJob, ChapterUploadPage
+from .counters import flush_likes, refresh_catalogue_likes
+from .feed import add_to_feed
+from .pipeline import upload_archive_images
+from .purge import purge_chapters, purge_team
+from .renditions import render_page
+from .storage import page_storage
+from .ranking import update_title_rankings
+from .trending import update_trending_scores, compact_activity_buckets
+from .cache import CATALOGUE, TRENDING, invalidate
+from cloudinary.exceptions import Error as CloudinaryError
+from zipfile import BadZipFile
+import logging
+
+logger = logging.getLogger(__name__)
 
 Notification = apps.get_model(app_label="social", model_name="Notification")
 Subscription = apps.get_model(app_label="social", model_name="Subscription")
@@ -52,42 +64,95 @@ def notify_users_of_new_chapter(title_id: int, team_id: int, chapter_id: int):
         pass
 
 
-@shared_task
-def upload_chapter_images(chapter_id: int, user_id):
+def chapter_folder(chapter: Chapter) -> str:
+    return f"{chapter.title.slug}/c{chapter.id}"
+
+
+def chapter_images(chapter: Chapter, pages: list) -> list:
+    return [
+        ChapterImages(chapter=chapter, page=number, image=page.image, content_hash=page.content_hash)
+        for number, page in enumerate(pages, 1)
+    ]
+
+
+def uploaded_pages(job: ChapterUploadJob) -> dict:
+    return dict(job.pages_of_job.values_list("content_hash", "image"))
+
+
+def checkpoint_page(job: ChapterUploadJob):
+    def on_uploaded(content_hash: str, image):
+        ChapterUploadPage.objects.get_or_create(job=job, content_hash=content_hash, defaults={"image": image})
+    return on_uploaded
+
+
+def discard_upload_job(job: ChapterUploadJob):
+    in_use = set(ChapterImages.objects.filter(chapter_id=job.chapter_id).values_list("image", flat=True))
+    page_storage().delete(
+        [image for image in job.pages_of_job.values_list("image", flat=True) if image not in in_use]
+    )
+    job.delete()
+
+
+def create_image_variants(image_ids: list, pages: list):
+    ChapterImageVariant.objects.bulk_create(
+        [
+            ChapterImageVariant(
+                image_id=image_id,
+                format=rendition.format,
+                width=rendition.width,
+                height=rendition.height,
+                name=rendition.name
+            ) for image_id, page in zip(image_ids, pages) for rendition in page.renditions or []
+        ],
+        ignore_conflicts=True
+    )
+
+
+def delete_image_archive(chapter: Chapter):
+    # the chapter is published by now, a leftover archive must not send it back to the retry or failure path
+    try:
+        chapter.image_archive.delete()
+    except OSError:
+        logger.exception("Failed to delete the image archive of chapter %s", chapter.id)
+
+
+@shared_task(bind=True, acks_late=True, max_retries=settings.CHAPTER_UPLOAD_RETRIES, default_retry_delay=60)
+def upload_chapter_images(self, chapter_id: int, user_id):
     try:
-        chapter = Chapter.objects.get(id=chapter_id)
+        chapter = Chapter.objects.select_related("title", "team").get(id=chapter_id)
     except Chapter.DoesNotExist:
         return
+    if chapter.is_published:
+        return
+    job, _ = ChapterUploadJob.objects.get_or_create(chapter=chapter, archive=chapter.image_archive.name)
     try:
+        pages = upload_archive_images(
+            chapter.image_archive,
+            chapter_folder(chapter),
+            uploaded=uploaded_pages(job),
+            on_uploaded=checkpoint_page(job),
+            manifest=chapter.image_manifest,
+            render=render_page
+        )
         with transaction.atomic():
-            with ZipFile(chapter.image_archive, "r") as archive:
-                images = []
-                for image in os_sorted(archive.namelist()):
-                    images.append(image)
-                ChapterImages.objects.bulk_create(
-                    [
-                        ChapterImages(
-                            chapter_id=chapter_id,
-                            image=uploader.upload_image(
-                                archive.read(image),
-                                folder=f"{chapter.title.slug}/c{chapter.id}"
-                            )
-                        ) for image in images
-                    ]
-                )
-                archive.close()
-                chapter.is_published = True
-                chapter.save()
-                Notification.objects.create(
-                    user_id=user_id,
-                    title=chapter.title,
-                    team=chapter.team,
-                    chapter=chapter,
-                    type=Notification.NotificationType.CHAPTER_UPLOAD_SUCCESS
-                )
-                chapter.image_archive.delete()
-                notify_users_of_new_chapter.delay(chapter.title.id, chapter.team.id, chapter.id)
-    except IntegrityError:
+            images = ChapterImages.objects.bulk_create(chapter_images(chapter, pages))
+            create_image_variants([image.id for image in images], pages)
+            chapter.is_published = True
+            chapter.save()
+            add_to_feed(chapter)
+            job.delete()
+            Notification.objects.create(
+                user_id=user_id,
+                title=chapter.title,
+                team=chapter.team,
+                chapter=chapter,
+                type=Notification.NotificationType.CHAPTER_UPLOAD_SUCCESS
+            )
+    except (IntegrityError, CloudinaryError, OSError, BadZipFile) as exc:
+        # uploaded pages are kept in the job, so a retry only sends the missing ones
+        if isinstance(exc, (CloudinaryError, OSError)) and self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        discard_upload_job(job)
         chapter.delete()
         try:
             Notification.objects.create(
@@ -98,47 +163,58 @@ def upload_chapter_images(chapter_id: int, user_id):
             )
         except IntegrityError:
             return
+    else:
+        delete_image_archive(chapter)
+        notify_users_of_new_chapter.delay(chapter.title.id, chapter.team.id, chapter.id)
 
 
-@shared_task
-def update_chapter_images(chapter_id: int, user_id):
+@shared_task(bind=True, acks_late=True, max_retries=settings.CHAPTER_UPLOAD_RETRIES, default_retry_delay=60)
+def update_chapter_images(self, chapter_id: int, user_id):
     try:
-        chapter = Chapter.objects.get(id=chapter_id)
+        chapter = Chapter.objects.select_related("title", "team").get(id=chapter_id)
     except Chapter.DoesNotExist:
         return
     chapter.is_published = False
     chapter.save()
+    job, _ = ChapterUploadJob.objects.get_or_create(chapter=chapter, archive=chapter.image_archive.name)
     try:
+        old_images = list(
+            ChapterImages.objects.filter(chapter=chapter).order_by("id").values_list("id", "content_hash", "image")
+        )
+        # unchanged pages are recognized by their hash and reuse already uploaded images
+        uploaded = {content_hash: image for _, content_hash, image in old_images if content_hash}
+        pages = upload_archive_images(
+            chapter.image_archive,
+            chapter_folder(chapter),
+            uploaded=uploaded | uploaded_pages(job),
+            on_uploaded=checkpoint_page(job),
+            manifest=chapter.image_manifest,
+            render=render_page
+        )
         with transaction.atomic():
-            ChapterImages.objects.filter(chapter=chapter).delete()
-            with ZipFile(chapter.image_archive, "r") as archive:
-                images = []
-                for image in os_sorted(archive.namelist()):
-                    images.append(image)
-                ChapterImages.objects.bulk_create(
-                    [
-                        ChapterImages(
-                            chapter_id=chapter_id,
-                            image=uploader.upload_image(
-                                archive.read(image),
-                                folder=f"{chapter.title.slug}/c{chapter.id}"
-                            )
-                        ) for image in images
-                    ]
-                )
-                archive.close()
-                chapter.is_published = True
-                chapter.save()
-                Notification.objects.create(
-                    user_id=user_id,
-                    title=chapter.title,
-                    team=chapter.team,
-                    chapter=chapter,
-                    type=Notification.NotificationType.CHAPTER_UPDATE_SUCCESS
-                )
-                chapter.image_archive.delete()
-    except IntegrityError:
+            if [page.content_hash for page in pages] != [content_hash for _, content_hash, _ in old_images]:
+                images = ChapterImages.objects.bulk_create(chapter_images(chapter, pages))
+                create_image_variants([image.id for image in images], pages)
+                # replaced pages are removed in a batch once the new ones are committed
+                ChapterImages.objects.filter(id__in=[image_id for image_id, _, _ in old_images]).delete()
+            else:
+                # fills in renditions of chapters uploaded before they were generated
+                create_image_variants([image_id for image_id, _, _ in old_images], pages)
+            chapter.is_published = True
+            chapter.save()
+            job.delete()
+            Notification.objects.create(
+                user_id=user_id,
+                title=chapter.title,
+                team=chapter.team,
+                chapter=chapter,
+                type=Notification.NotificationType.CHAPTER_UPDATE_SUCCESS
+            )
+    except (IntegrityError, CloudinaryError, OSError, BadZipFile) as exc:
+        if isinstance(exc, (CloudinaryError, OSError)) and self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
         try:
+            discard_upload_job(job)
             if not chapter.is_published:
                 chapter.is_published = True
                 chapter.save()
@@ -150,21 +226,52 @@ def update_chapter_images(chapter_id: int, user_id):
             )
         except IntegrityError:
             return
+    else:
+        delete_image_archive(chapter)
 
 
-@shared_task
-def delete_chapter(chapter_id: int):
-    try:
-        chapter = Chapter.objects.get(id=chapter_id)
-        chapter.delete()
-    except Chapter.DoesNotExist:
-        return
+def report_progress(task):
+    def progress(done: int, total: int):
+        task.update_state(state="PROGRESS", meta={"done": done, "total": total})
+    return progress
 
 
-@shared_task
-def delete_team(team_id: int):
+@shared_task(bind=True)
+def delete_chapter(self, chapter_id: int):
+    purge_chapters([chapter_id], report_progress(self))
+
+
+@shared_task(bind=True)
+def delete_team(self, team_id: int):
     try:
         team = Team.objects.get(id=team_id)
-        team.delete()
     except Team.DoesNotExist:
         return
+    purge_team(team, report_progress(self))
+
+
+@shared_task
+def update_trending_titles():
+    update_trending_scores()
+    invalidate(TRENDING)
+
+
+@shared_task
+def compact_title_activity():
+    compact_activity_buckets()
+
+
+@shared_task
+def flush_chapter_likes():
+    flush_likes()
+
+
+@shared_task
+def refresh_catalogue():
+    refresh_catalogue_likes()
+
+
+@shared_task
+def update_rankings():
+    if update_title_rankings():
+        invalidate(CATALOGUE)
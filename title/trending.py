@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.db import connection, transaction
+import datetime
+
+ACTIVITY_COUNTERS = ("likes", "ratings", "list_adds", "comments")
+
+# score -> (window, half-life of an event's weight)
+TRENDING_SCORES = {
+    "popular": (datetime.timedelta(days=30), datetime.timedelta(days=7)),
+    "weekly": (datetime.timedelta(days=7), datetime.timedelta(days=1)),
+}
+
+# hourly buckets older than this are rolled up into daily ones
+HOURLY_ACTIVITY_KEPT = datetime.timedelta(days=2)
+
+
+def record_activity(counter: str, titles: str) -> str:
+    # trigger function SQL adding one event to the current hourly bucket of titles selected by a title_id query
+    return f"""
+        insert into title_titleactivity (title_id, bucket, daily, {", ".join(ACTIVITY_COUNTERS)})
+        select title_id, date_trunc('hour', now()), false,
+            {", ".join("1" if name == counter else "0" for name in ACTIVITY_COUNTERS)}
+        from ({titles}) as activity
+        on conflict (title_id, bucket, daily) do update
+        set {counter} = title_titleactivity.{counter} + 1;
+    """
+
+
+UPDATE_TRENDING_SQL = f"""
+    insert into title_titletrending (title_id, popular, weekly, likes, updated_at)
+    select title_id,
+        coalesce(sum(activity * power(0.5, age / %(popular_half_life)s)) filter (where age < %(popular_window)s), 0),
+        coalesce(sum(activity * power(0.5, age / %(weekly_half_life)s)) filter (where age < %(weekly_window)s), 0),
+        coalesce(sum(likes) filter (where age < %(popular_window)s), 0),
+        now()
+    from (
+        select title_id, likes, extract(epoch from now() - bucket) as age,
+            {" + ".join(f"{counter} * %({counter})s" for counter in ACTIVITY_COUNTERS)} as activity
+        from title_titleactivity
+        where bucket >= now() - %(window)s * interval '1 second'
+    ) as buckets
+    group by title_id
+    on conflict (title_id) do update
+    set popular = excluded.popular, weekly = excluded.weekly, likes = excluded.likes, updated_at = excluded.updated_at;
+    delete from title_titletrending where updated_at < now();
+"""
+
+COMPACT_ACTIVITY_SQL = f"""
+    with compacted as (
+        delete from title_titleactivity
+        where not daily and bucket < date_trunc('day', now() - %(hourly_kept)s * interval '1 second')
+        returning *
+    )
+    insert into title_titleactivity (title_id, bucket, daily, {", ".join(ACTIVITY_COUNTERS)})
+    select title_id, date_trunc('day', bucket), true, {", ".join(f"sum({counter})" for counter in ACTIVITY_COUNTERS)}
+    from compacted
+    group by title_id, date_trunc('day', bucket)
+    on conflict (title_id, bucket, daily) do update
+    set {", ".join(
+        f"{counter} = title_titleactivity.{counter} + excluded.{counter}" for counter in ACTIVITY_COUNTERS
+    )};
+    delete from title_titleactivity where bucket < date_trunc('day', now() - %(window)s * interval '1 second');
+"""
+
+
+def activity_window() -> datetime.timedelta:
+    return max(window for window, _ in TRENDING_SCORES.values())
+
+
+def update_trending_scores():
+    # scores are written in a single transaction, so titles without activity in the window are the ones not updated
+    params = {"window": activity_window().total_seconds(), **settings.TRENDING_ACTIVITY_WEIGHTS}
+    for score, (window, half_life) in TRENDING_SCORES.items():
+        params[f"{score}_window"] = window.total_seconds()
+        params[f"{score}_half_life"] = half_life.total_seconds()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(UPDATE_TRENDING_SQL, params)
+
+
+def compact_activity_buckets():
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(COMPACT_ACTIVITY_SQL, {
+            "hourly_kept": HOURLY_ACTIVITY_KEPT.total_seconds(),
+            "window": activity_window().total_seconds(),
+        })
@@ -7,6 +7,7 @@ from .views import (
     NewChapters, DeleteTeamPicture, DeletePersonPicture, DeletePublisherPicture, InviteToTeam, TitleSearchView,
     TeamParticipantUpdateDestroy, PersonSearchView, PublisherSearchView, TeamSearchView, PopularNowTitles,
     UploadChapter, UpdateChapter, DeleteChapter, UserTeamsWithChapterAccess, ChapterDetail, AllTitleTeamChapters,
+    TrendingTitles, KeywordTrendingTitles
 
 )
 
@@ -19,6 +20,8 @@ urlpatterns = [
     path("new-titles/", NewTitles.as_view(), name="latestTitles"),
     path("new-chapters/", NewChapters.as_view(), name="latestChapters"),
     path("popular-now-titles/", PopularNowTitles.as_view(), name="popularTitles"),
+    path("trending-titles/", TrendingTitles.as_view(), name="trendingTitles"),
+    path("trending-titles/<slug:keyword>/", KeywordTrendingTitles.as_view(), name="keywordTrendingTitles"),
     # person
     path("person/", PersonCreateView.as_view(), name="personCreate"),
     path("person/<int:person_id>/", PersonDetailView.as_view(), name="personRetrieveUpdateDestroy"),
@@ -1,13 +1,26 @@
 from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.functions import JSONObject
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from rest_framework import status
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, NotFound
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from rest_framework.pagination import LimitOffsetPagination
-from .models import TeamParticipant
-from zipfile import ZipFile, BadZipFile
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .models import TeamParticipant, Chapter, ChapterImages, ChapterImageVariant
+from .renditions import Rendition, srcset
+from .storage import page_storage
+from zipfile import ZipFile, ZipInfo, BadZipFile
 from io import BytesIO
+from natsort import os_sorted
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from collections import OrderedDict
 from PIL import Image
+import json
+
+IMAGE_HEADER_SIZE = 1024 * 64
 
 
 class ReadOnly(BasePermission):
@@ -58,27 +71,181 @@ class CanUpdateChapter(BasePermission):
             return False
 
 
-def validate_image_archive(image_archive) -> int:
+def page_header(archive: ZipFile, info: ZipInfo) -> Image.Image:
+    # the size is known from the first bytes unless large metadata pushes the frame header further
+    with archive.open(info) as member:
+        try:
+            return Image.open(BytesIO(member.read(IMAGE_HEADER_SIZE)))
+        except OSError:
+            if info.file_size <= IMAGE_HEADER_SIZE:
+                raise
+    with archive.open(info) as member:
+        return Image.open(member)
+
+
+def validate_image_archive(image_archive) -> tuple:
     file_path = image_archive if type(image_archive) == InMemoryUploadedFile \
         else image_archive.temporary_file_path()
+    manifest = []
     try:
         with ZipFile(file_path, "r") as archive:
-            files = archive.namelist()
-            if len(files) == 0:
+            pages = [info for info in archive.infolist() if not info.is_dir()]
+            if len(pages) == 0:
                 raise BadZipFile
-            for image in files:
-                if image.split(".")[-1].lower() not in settings.ALLOWED_CHAPTER_IMAGE_EXTENSIONS:
-                    return 1
-                im = BytesIO(archive.read(image))
-                Image.open(im).verify()
-                if im.getbuffer().nbytes > settings.ALLOWED_CHAPTER_IMAGE_SIZE:
-                    return 2
+            # declared sizes come from the central directory, so nothing is decompressed before this check
+            for info in pages:
+                if info.filename.split(".")[-1].lower() not in settings.ALLOWED_CHAPTER_IMAGE_EXTENSIONS:
+                    return 1, None
+                if info.file_size > settings.ALLOWED_CHAPTER_IMAGE_SIZE:
+                    return 2, None
+                if info.file_size > info.compress_size * settings.ALLOWED_CHAPTER_IMAGE_COMPRESSION_RATIO:
+                    return 3, None
+            for info in os_sorted(pages, key=lambda page: page.filename):
+                image = page_header(archive, info)
+                if image.format.lower() not in settings.ALLOWED_CHAPTER_IMAGE_EXTENSIONS:
+                    return 1, None
+                manifest.append({
+                    "name": info.filename,
+                    "offset": info.header_offset,
+                    "size": info.file_size,
+                    "width": image.width,
+                    "height": image.height
+                })
     except (BadZipFile, Image.UnidentifiedImageError, IOError):
-        return 3
+        return 3, None
+    return None, manifest
 
 
-class NewChaptersPagination(LimitOffsetPagination):
-    default_limit = 10
+NEIGHBOUR_ORDERINGS = {
+    "previous": ["-volume_number", "-chapter_number"],
+    "next": ["volume_number", "chapter_number"],
+}
+
+
+def neighbour_chapters(direction: str, outer=OuterRef):
+    # published chapters of the team past the outer chapter, nearest first, read from the reading order index;
+    # outer refers to the chapter query, nested subqueries pass OuterRef(OuterRef(...))
+    ordering = NEIGHBOUR_ORDERINGS[direction]
+    return Chapter.objects.filter(
+        keyset_filter(ordering, [outer("volume_number"), outer("chapter_number")]),
+        title_id=outer("title_id"),
+        team_id=outer("team_id"),
+        is_published=True
+    ).order_by(*ordering)
+
+
+def chapter_neighbour(direction: str) -> Subquery:
+    # previous or next chapter as an annotation of the chapter query, null at either end
+    return Subquery(neighbour_chapters(direction).values(
+        json=JSONObject(id="id", volume_number="volume_number", chapter_number="chapter_number", name="name")
+    )[:1])
+
+
+def chapter_page_rows(chapter_id, first: int = None) -> ArraySubquery:
+    # pages with their renditions as an annotation of the chapter query, only the first ones when given
+    images = ChapterImages.objects.filter(chapter_id=chapter_id)
+    if first is not None:
+        images = images.filter(page__lte=first)
+    return ArraySubquery(images.order_by("page", "id").values(json=JSONObject(
+        image="image",
+        renditions=ArraySubquery(
+            ChapterImageVariant.objects.filter(image_id=OuterRef("id")).order_by("width").values(
+                json=JSONObject(format="format", width="width", height="height", name="name")
+            )
+        )
+    )))
+
+
+def chapter_pages(rows: list) -> list:
+    # pages of chapter_page_rows in reading order, the widest rendition has the size of the original page
+    storage = page_storage()
+    pages = []
+    for row in rows:
+        renditions = [Rendition(**rendition) for rendition in row["renditions"]]
+        pages.append({
+            "image": storage.url(row["image"]),
+            "width": renditions[-1].width if renditions else None,
+            "height": renditions[-1].height if renditions else None,
+            "srcset": srcset(renditions, storage)
+        })
+    return pages
+
+
+def keyset_filter(ordering: list, position: list) -> Q:
+    # rows after the position in (field, ..., id) order, with the direction of every field
+    condition = Q()
+    for index, field in enumerate(ordering):
+        lookup = "lt" if field.startswith("-") else "gt"
+        after = Q(**{f"{field.lstrip('-')}__{lookup}": position[index]})
+        for previous, value in zip(ordering[:index], position[:index]):
+            after &= Q(**{previous.lstrip("-"): value})
+        condition |= after
+    return condition
+
+
+def encode_cursor(position: list) -> str:
+    # datetimes keep their microseconds, otherwise rows added within the same millisecond would be skipped
+    return urlsafe_b64encode(json.dumps(position, default=lambda value: value.isoformat()).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        position = json.loads(urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise NotFound("Неверный курсор")
+    # positions are compared with column values, anything else would fail in the query
+    if not isinstance(position, list) or not all(isinstance(value, (str, int, float)) for value in position):
+        raise NotFound("Неверный курсор")
+    return position
+
+
+class TitlePagination(LimitOffsetPagination):
+    # clients opt in to keyset pages with ?cursor= (empty for the first page), no COUNT is run then
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = self.get_cursor(request)
+        # offset pages may also be taken from a list of ids evaluated by the columnar filter engine
+        ordering = list(queryset.query.order_by) if self.cursor is not None else []
+        if self.cursor is None or not all(isinstance(field, str) for field in ordering):
+            self.cursor = None
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.limit = self.get_limit(request)
+        # id is the tie-breaker and follows the direction of the main ordering
+        ordering = [field for field in ordering if field.lstrip("-") not in ("id", "pk")]
+        ordering.append("-id" if ordering and ordering[0].startswith("-") else "id")
+        queryset = queryset.order_by(*ordering)
+        if self.cursor:
+            position = decode_cursor(self.cursor)
+            if len(position) != len(ordering):
+                raise NotFound("Неверный курсор")
+            queryset = queryset.filter(keyset_filter(ordering, position))
+        page = list(queryset[:self.limit + 1])
+        self.next_position = None
+        if len(page) > self.limit:
+            page = page[:self.limit]
+            self.next_position = [getattr(page[-1], field.lstrip("-")) for field in ordering]
+        return page
+
+    def get_cursor(self, request):
+        return request.query_params.get(self.cursor_query_param)
+
+    def get_next_link(self):
+        if self.cursor is None:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        if self.cursor is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("results", data)
+        ]))
 
 
 class NotMatureException(APIException):
@@ -91,3 +258,16 @@ class NotAuthenticatedException(APIException):
     status_code = status.HTTP_401_UNAUTHORIZED
     default_detail = "Вы должны быть старше 18 лет, чтобы иметь доступ к этой главе"
     default_code = "data"
+
+
+class NewChaptersPagination(TitlePagination):
+    # the feed is always paged by keyset, so deep pages cost as much as the first one
+    default_limit = 10
+
+    def get_cursor(self, request):
+        return request.query_params.get(self.cursor_query_param, "")
+
+
+class ChapterListPagination(LimitOffsetPagination):
+    # lists are only paged when a limit is asked for
+    default_limit = None
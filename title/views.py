@@ -1,21 +1,20 @@
-from django.contrib.postgres.aggregates import ArrayAgg
 from rest_framework import generics, status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from django.db import IntegrityError, transaction
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.db import DataError, IntegrityError, transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum, Q, F, Value, Count, Exists, OuterRef, FloatField, IntegerField
-from django.db.models.functions import Greatest, Coalesce
+from django.db.models import Sum, Q, F, Value, Count, Exists, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce, Lower
 from .models import (
-    Title, Rating, UserTitleRating, Chapter, Keyword, ReleaseFormat, Person, Publisher, Team, TeamParticipant,
-    ChapterLikes
+    Title, UserTitleRating, Chapter, Keyword, ReleaseFormat, Person, Publisher, Team, TeamParticipant,
+    ChapterLikes, ChapterFeedEntry
 )
 from .serializers import (
-    TitleDetailsSerializer, TitleListSerializer, LikeChapterSerializer, RateTitleSerializer, ChapterSerializer,
+    TitleListSerializer, LikeChapterSerializer, RateTitleSerializer,
     ChapterAnonymousSerializer, KeywordSerializer, ReleaseFormatSerializer, PersonSerializer, PublisherSerializer,
     TeamSerializer, RandomTitleSerializer, LatestChaptersSerializer, InviteToTeamSerializer, ChapterDetailSerializer,
     TeamParticipantRUDSerializer, TitleSearchSerializer, PersonSearchSerializer, PublisherSearchSerializer,
@@ -24,15 +23,22 @@ from .serializers import (
 )
 from django_filters import rest_framework as filters
 from .filters import TitleFilter, RelatedTitleFilter
-from random import choice
-from django.utils import timezone
+from .search import search, is_fuzzy
+from .cache import CachedListMixin, cached, title_tag, chapter_list_tag, TITLES, CHAPTERS, FILTERS, CATALOGUE, TRENDING
+from .documents import title_document, overlay_title_document
+from .facets import facet_counts, is_faceted
+from .columnar import filter_title_ids
+from .sampling import random_title_id
+from .ratings import rate_title
 from django.apps import apps
 from django.conf import settings
 from .tasks import upload_chapter_images, update_chapter_images, delete_chapter, delete_team
 from .utils import (
     ReadOnly, IsTeamAdmin, CanManageParticipants, CanUpdateChapter, validate_image_archive, NewChaptersPagination,
-    NotMatureException, NotAuthenticatedException
+    NotMatureException, NotAuthenticatedException, chapter_pages, chapter_page_rows, chapter_neighbour,
+    neighbour_chapters, TitlePagination, ChapterListPagination
 )
+from django.utils import timezone
 import datetime
 from dateutil.relativedelta import relativedelta
 
@@ -41,49 +47,47 @@ Notification = apps.get_model(app_label="social", model_name="Notification")
 
 
 class TitleList(generics.ListAPIView):
-    queryset = Title.objects.annotate(
-        total_rating=Coalesce(
-            Sum(
-                F("ratings_of_title__amount") * 1.0 * F("ratings_of_title__rating__mark")
-            ) / Greatest(Sum("ratings_of_title__amount"), 1), 0,
-            output_field=FloatField()
-        )
-    )
+    pagination_class = TitlePagination
+    queryset = Title.objects.catalogue()
     serializer_class = TitleListSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = TitleFilter
 
+    def list(self, request, *args, **kwargs):
+        title_ids = None
+        if TitlePagination.cursor_query_param not in request.query_params:
+            title_ids = filter_title_ids(self.filterset_class(data=request.query_params, queryset=self.queryset))
+        if title_ids is None:
+            response = super().list(request, *args, **kwargs)
+        else:
+            # only the page of titles is fetched from the database
+            page = self.paginate_queryset(title_ids)
+            titles = self.get_queryset().in_bulk(page)
+            serializer = self.get_serializer([titles[title_id] for title_id in page if title_id in titles], many=True)
+            response = self.get_paginated_response(serializer.data)
+        if is_faceted(request):
+            response.data["facets"] = facet_counts(request.query_params)
+        return response
+
 
 class TitleDetails(APIView):
     def get(self, request, **kwargs):
         slug = self.kwargs.get("slug")
-        subs = []
         if self.request.user.is_anonymous:
-            title = get_object_or_404(Title.objects.annotate(
-                likes=Coalesce(Sum("chapters_of_title__likes"), 0),
-                subscribed=Value(False)
-            ), slug=slug)
-        else:
-            title = get_object_or_404(Title.objects.annotate(
-                likes=Coalesce(Sum("chapters_of_title__likes"), 0),
-                subscribed=Exists(
-                    Title.objects.filter(
-                        title_subscriptions__user=self.request.user,
-                        title_subscriptions__title=OuterRef("id"),
-                        title_subscriptions__team__isnull=True
-                    )
-                )
-            ), slug=slug)
-
-            subs = list(Subscription.objects.filter(
-                Q(user=self.request.user) &
-                Q(title=title.id) &
-                Q(team__isnull=False)
-            ).values_list("team", flat=True))
-
+            return Response(cached(
+                f"TitleDetails:{slug}", [TITLES, title_tag(slug)], lambda: {
+                    "title": overlay_title_document(title_document(slug)[1], request, False),
+                    "subscribed_to_teams": [],
+                }
+            ), status=status.HTTP_200_OK)
+        title_id, document = title_document(slug)
+        # title subscriptions have no team
+        subscriptions = list(
+            Subscription.objects.filter(user=self.request.user, title_id=title_id).values_list("team", flat=True)
+        )
         return Response({
-            "title": TitleDetailsSerializer(title, context={'request': request}).data,
-            "subscribed_to_teams": subs,
+            "title": overlay_title_document(document, request, None in subscriptions),
+            "subscribed_to_teams": [team for team in subscriptions if team is not None],
         }, status=status.HTTP_200_OK)
 
 
@@ -108,13 +112,11 @@ class RateTitle(generics.CreateAPIView):
 
     def post(self, request, *args, **kwargs):
         try:
-            UserTitleRating.objects.create(
-                user_id=self.request.user.id,
-                title_id=request.data.get("title"),
-                rating=get_object_or_404(Rating, mark=request.data.get("rating"))
-            )
-        except IntegrityError:
+            rated = rate_title(self.request.user.id, request.data.get("title"), request.data.get("rating"))
+        except (IntegrityError, DataError):
             return Response(status=status.HTTP_400_BAD_REQUEST)
+        if not rated:
+            return Response(status=status.HTTP_404_NOT_FOUND)
         return Response(data={"data": "Ваш голос учтен"}, status=status.HTTP_200_OK)
 
 
@@ -148,41 +150,52 @@ class RateTitleDestroy(generics.DestroyAPIView):
 
 
 class ChapterListForTeam(generics.ListAPIView):
-    pagination_class = None
-
-    def get_serializer_class(self):
-        if self.request.user.is_anonymous:
-            return ChapterAnonymousSerializer
-        return ChapterSerializer
+    # the whole list is cached per title and team, ?limit=&offset= pages it for long running titles
+    pagination_class = ChapterListPagination
 
-    def get_queryset(self):
+    def list(self, request, *args, **kwargs):
         title_id = self.kwargs.get("title_id")
         team_id = self.kwargs.get("team_id")
-        if self.request.user.is_anonymous:
-            return Chapter.objects.filter(title_id=title_id, team_id=team_id, is_published=True)
-        return Chapter.objects.filter(title_id=title_id, team_id=team_id, is_published=True).annotate(
-            liked_by_user=Exists(
-                ChapterLikes.objects.filter(chapter_id=OuterRef("id"), user_id=self.request.user.id)
-            )
+        chapters = cached(
+            f"ChapterListForTeam:{title_id}:{team_id}",
+            [chapter_list_tag(title_id, team_id)],
+            lambda: list(ChapterAnonymousSerializer(
+                Chapter.objects.filter(title_id=title_id, team_id=team_id, is_published=True).order_by(
+                    "-volume_number", "-chapter_number"
+                ),
+                many=True
+            ).data),
+            settings.CHAPTER_LIST_CACHE_TIMEOUT
         )
+        page = self.paginate_queryset(chapters)
+        if page is not None:
+            chapters = page
+        if not request.user.is_anonymous:
+            # likes of the user are looked up by (user, chapter) for the shown chapters only
+            liked = set(ChapterLikes.objects.filter(
+                user_id=request.user.id, chapter_id__in=[chapter["id"] for chapter in chapters]
+            ).values_list("chapter_id", flat=True))
+            chapters = [{**chapter, "liked_by_user": chapter["id"] in liked} for chapter in chapters]
+        return Response(chapters) if page is None else self.get_paginated_response(chapters)
 
 
 class GetAllFilteringValues(generics.ListAPIView):
     pagination_class = None
 
-    @method_decorator(cache_page(60 * 60 * 24))  # cache for one day
     def list(self, request, *args, **kwargs):
         def serialize(choices):
             return [{"slug": obj[0], "name": obj[1]} for obj in choices]
 
-        data = {
-            "age": serialize(Title.TitleAgeRating.choices),
-            "type": serialize(Title.TitleType.choices),
-            "status": serialize(Title.TitleStatus.choices),
-            "release_format": ReleaseFormatSerializer(ReleaseFormat.objects.all(), many=True).data,
-            "keyword": KeywordSerializer(Keyword.objects.all().order_by("name"), many=True).data
-        }
-        return Response(data)
+        def filtering_values():
+            return {
+                "age": serialize(Title.TitleAgeRating.choices),
+                "type": serialize(Title.TitleType.choices),
+                "status": serialize(Title.TitleStatus.choices),
+                "release_format": ReleaseFormatSerializer(ReleaseFormat.objects.all(), many=True).data,
+                "keyword": KeywordSerializer(Keyword.objects.all().order_by("name"), many=True).data
+            }
+
+        return Response(cached("GetAllFilteringValues", [FILTERS], filtering_values, 60 * 60 * 24))
 
 
 class PersonCreateView(generics.CreateAPIView):
@@ -212,20 +225,14 @@ class DeletePersonPicture(APIView):
 
 
 class PersonTitlesGetView(generics.ListAPIView):
+    pagination_class = TitlePagination
     serializer_class = TitleListSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = RelatedTitleFilter
 
     def get_queryset(self):
         person_id = self.kwargs.get("person_id")
-        return Title.objects.filter(persons_of_title__person=person_id).annotate(
-            total_rating=Coalesce(
-                Sum(
-                    F("ratings_of_title__amount") * 1.0 * F("ratings_of_title__rating__mark")
-                ) / Greatest(Sum("ratings_of_title__amount"), 1), 0,
-                output_field=FloatField()
-            )
-        )
+        return Title.objects.catalogue().filter(persons_of_title__person=person_id).distinct()
 
 
 # views for publishers
@@ -256,20 +263,14 @@ class DeletePublisherPicture(APIView):
 
 
 class PublisherTitlesGetView(generics.ListAPIView):
+    pagination_class = TitlePagination
     serializer_class = TitleListSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = RelatedTitleFilter
 
     def get_queryset(self):
         slug = self.kwargs.get("slug")
-        return Title.objects.filter(publishers_of_title__publisher__slug=slug).annotate(
-            total_rating=Coalesce(
-                Sum(
-                    F("ratings_of_title__amount") * 1.0 * F("ratings_of_title__rating__mark")
-                ) / Greatest(Sum("ratings_of_title__amount"), 1), 0,
-                output_field=FloatField()
-            )
-        )
+        return Title.objects.catalogue().filter(publishers_of_title__publisher__slug=slug)
 
 
 # views for teams
@@ -352,20 +353,14 @@ class DeleteTeamPicture(APIView, IsTeamAdmin):
 
 
 class TeamTitlesGetView(generics.ListAPIView):
+    pagination_class = TitlePagination
     serializer_class = TitleListSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = RelatedTitleFilter
 
     def get_queryset(self):
         slug = self.kwargs.get("slug")
-        return Title.objects.filter(teams_of_title__team__slug=slug).annotate(
-            total_rating=Coalesce(
-                Sum(
-                    F("ratings_of_title__amount") * 1.0 * F("ratings_of_title__rating__mark")
-                ) / Greatest(Sum("ratings_of_title__amount"), 1), 0,
-                output_field=FloatField()
-            )
-        )
+        return Title.objects.catalogue().filter(teams_of_title__team__slug=slug)
 
 
 class InviteToTeam(generics.CreateAPIView):
@@ -471,10 +466,14 @@ class TeamParticipantUpdateDestroy(APIView, CanManageParticipants):
 
 
 class RandomTitleView(generics.RetrieveAPIView):
+    # takes the catalogue filters, e.g. ?status=Ongoing&type=Manhwa&keyword=x
     serializer_class = RandomTitleSerializer
 
     def get_object(self):
-        return get_object_or_404(Title, id=choice(Title.objects.values_list('id', flat=True)))
+        filterset = TitleFilter(data=self.request.query_params, queryset=Title.objects.all())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return get_object_or_404(Title.objects.only("slug"), id=random_title_id(filterset))
 
 
 class TitleSearchView(generics.ListAPIView):
@@ -482,16 +481,7 @@ class TitleSearchView(generics.ListAPIView):
 
     def get_queryset(self):
         name = self.kwargs.get("name")
-        return Title.objects.filter(
-            Q(name__icontains=name) | Q(english_name__icontains=name) | Q(alternative_names__icontains=name)
-        ).annotate(
-            total_rating=Coalesce(
-                Sum(
-                    F("ratings_of_title__amount") * 1.0 * F("ratings_of_title__rating__mark")
-                ) / Greatest(Sum("ratings_of_title__amount"), 1), 0,
-                output_field=FloatField()
-            )
-        )
+        return search(Title.objects.catalogue(), name, vector="search_vector", fuzzy=is_fuzzy(self.request.query_params))
 
 
 class PersonSearchView(generics.ListAPIView):
@@ -499,7 +489,7 @@ class PersonSearchView(generics.ListAPIView):
 
     def get_queryset(self):
         name = self.kwargs.get("name")
-        return Person.objects.filter(Q(name__icontains=name) | Q(alternative_names__icontains=name))
+        return search(Person.objects.all(), name, vector="search_vector", fuzzy=is_fuzzy(self.request.query_params))
 
 
 class PublisherSearchView(generics.ListAPIView):
@@ -507,7 +497,7 @@ class PublisherSearchView(generics.ListAPIView):
 
     def get_queryset(self):
         name = self.kwargs.get("name")
-        return Publisher.objects.filter(Q(name__icontains=name) | Q(alternative_names__icontains=name))
+        return search(Publisher.objects.all(), name, vector="search_vector", fuzzy=is_fuzzy(self.request.query_params))
 
 
 class TeamSearchView(generics.ListAPIView):
@@ -515,38 +505,53 @@ class TeamSearchView(generics.ListAPIView):
 
     def get_queryset(self):
         name = self.kwargs.get("name")
-        return Team.objects.filter(Q(name__icontains=name))
+        return search(Team.objects.all(), name, document=Lower("name"), fuzzy=is_fuzzy(self.request.query_params))
 
 
-class NewTitles(generics.ListAPIView):
+class NewTitles(CachedListMixin, generics.ListAPIView):
+    cache_tags = (TITLES, CATALOGUE)
     pagination_class = None
     serializer_class = TitleListSerializer
-    queryset = Title.objects.annotate(
-        total_rating=Coalesce(
-            Sum(
-                F("ratings_of_title__amount") * 1.0 * F("ratings_of_title__rating__mark")
-            ) / Greatest(Sum("ratings_of_title__amount"), 1), 0,
-            output_field=FloatField()
-        )
-    ).order_by("-id")[:20]
+    queryset = Title.objects.catalogue().order_by("-id")[:20]
 
 
-class NewChapters(generics.ListAPIView):
+class NewChapters(CachedListMixin, generics.ListAPIView):
+    cache_tags = (TITLES, CHAPTERS)
     serializer_class = LatestChaptersSerializer
     pagination_class = NewChaptersPagination
-    queryset = Chapter.objects.filter(
-        date_added__gte=timezone.now() - datetime.timedelta(days=7),
-        is_published=True
-    ).order_by("-id")
+
+    def get_queryset(self):
+        # title, team and chapter of a page of entries are joined in the same query, the feed keeps a week as before
+        return ChapterFeedEntry.objects.filter(
+            updated_at__gte=timezone.now() - datetime.timedelta(days=7)
+        ).select_related("title", "team", "chapter").order_by("-updated_at", "-id")
 
 
-class PopularNowTitles(generics.ListAPIView):
+class TrendingTitles(CachedListMixin, generics.ListAPIView):
+    # scores are recomputed from activity buckets by update_trending_titles, which bumps the tag
+    cache_tags = (TITLES, TRENDING)
+    pagination_class = None
     serializer_class = PopularNowTitlesSerializer
-    queryset = Title.objects.filter(
-        chapters_of_title__likes_for_chapter__date_added__gte=timezone.now() - datetime.timedelta(days=30)
-    ).annotate(
-        likes=Count("*")
-    ).order_by("-likes")[:20]
+    score = "weekly"
+
+    def get_trending_queryset(self):
+        return Title.objects.catalogue().filter(
+            **{f"trending_of_title__{self.score}__gt": 0}
+        ).annotate(
+            recent_likes=F("trending_of_title__likes")
+        ).order_by(f"-trending_of_title__{self.score}")
+
+    def get_queryset(self):
+        return self.get_trending_queryset()[:20]
+
+
+class PopularNowTitles(TrendingTitles):
+    score = "popular"
+
+
+class KeywordTrendingTitles(TrendingTitles):
+    def get_trending_queryset(self):
+        return super().get_trending_queryset().filter(keywords__slug=self.kwargs.get("keyword"))
 
 
 class UploadChapter(generics.CreateAPIView):
@@ -581,7 +586,8 @@ class UploadChapter(generics.CreateAPIView):
                     )
 
                 # validate archive
-                match validate_image_archive(image_archive):
+                error, manifest = validate_image_archive(image_archive)
+                match error:
                     case 1:
                         return Response(
                             data={"data": f"Допустимые расширения страниц: {settings.ALLOWED_CHAPTER_IMAGE_EXTENSIONS}"},
@@ -598,7 +604,7 @@ class UploadChapter(generics.CreateAPIView):
 
                 # upload chapter and create task to load images
                 try:
-                    chapter = serializer.save()
+                    chapter = serializer.save(image_manifest=manifest)
                     upload_chapter_images.delay(chapter.id, user.id)
                     return Response(status=status.HTTP_201_CREATED)
                 except IntegrityError:
@@ -633,8 +639,10 @@ class UpdateChapter(generics.UpdateAPIView, CanUpdateChapter):
             if not chapter.is_published:
                 return Response(data={"data": "Нельзя редактировать главу, которая еще не опубликована"})
             self.check_object_permissions(self.request, chapter)
+            manifest = None
             if image_archive:
-                match validate_image_archive(image_archive):
+                error, manifest = validate_image_archive(image_archive)
+                match error:
                     case 1:
                         return Response(
                             data={
@@ -655,6 +663,7 @@ class UpdateChapter(generics.UpdateAPIView, CanUpdateChapter):
                 chapter.volume_number = volume_number
                 chapter.chapter_number = chapter_number
                 chapter.image_archive = image_archive
+                chapter.image_manifest = manifest
                 chapter.save()
                 # replace image archive
                 if image_archive:
@@ -710,30 +719,40 @@ class ChapterDetail(generics.RetrieveAPIView):
     serializer_class = ChapterDetailSerializer
 
     def get_object(self):
-        title_slug = self.kwargs.get("title_slug")
-        team_slug = self.kwargs.get("team_slug")
-        volume = self.kwargs.get("volume")
-        number = self.kwargs.get("number")
-        # check permissions
-        if get_object_or_404(Title, slug=title_slug).age_rating == Title.TitleAgeRating.MATURE:
+        # title, team, neighbours and pages come with the chapter in one query
+        chapter = Chapter.objects.select_related("title", "team").annotate(
+            liked_by_user=Exists(
+                ChapterLikes.objects.filter(chapter_id=OuterRef("id"), user_id=self.request.user.id)
+            ) if self.request.user.is_authenticated else Value(False),
+            previous=chapter_neighbour("previous"),
+            next=chapter_neighbour("next"),
+            page_rows=chapter_page_rows(OuterRef("id")),
+            # first pages of the next chapter are preloaded by the reader
+            prefetch_rows=chapter_page_rows(
+                Subquery(neighbour_chapters("next", lambda name: OuterRef(OuterRef(name))).values("id")[:1]),
+                settings.READER_PREFETCH_PAGES
+            )
+        ).filter(
+            title__slug=self.kwargs.get("title_slug"),
+            team__slug=self.kwargs.get("team_slug"),
+            volume_number=self.kwargs.get("volume"),
+            chapter_number=self.kwargs.get("number"),
+            is_published=True
+        ).first()
+        # check permissions, the title is only looked up on its own when there is no such chapter
+        title = chapter.title if chapter is not None else get_object_or_404(
+            Title.objects.only("age_rating"), slug=self.kwargs.get("title_slug")
+        )
+        if title.age_rating == Title.TitleAgeRating.MATURE:
             if self.request.user.is_anonymous:
                 raise NotAuthenticatedException
             elif self.request.user.birth_date + relativedelta(years=18) > datetime.date.today():
                 raise NotMatureException
-        # get chapter
-        return get_object_or_404(
-            Chapter.objects.annotate(
-                liked_by_user=Exists(
-                    ChapterLikes.objects.filter(chapter_id=OuterRef("id"), user_id=self.request.user.id)
-                ) if self.request.user.is_authenticated else Value(False),
-                images=ArrayAgg(F("images_of_chapter__image"))
-            ),
-            title__slug=title_slug,
-            team__slug=team_slug,
-            volume_number=volume,
-            chapter_number=number,
-            is_published=True
-        )
+        if chapter is None:
+            raise Http404
+        chapter.pages = chapter_pages(chapter.page_rows)
+        chapter.prefetch = chapter_pages(chapter.prefetch_rows)
+        return chapter
 
 
 class AllTitleTeamChapters(generics.ListAPIView):
@@ -0,0 +1,20 @@
+# Generated by Django 4.0.5 on 2026-10-18 12:51
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_birth_date'),
+        ('title', '0038_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('username'), name='gin_trgm_ops'), name='user_username_trgm_idx'),
+        ),
+    ]
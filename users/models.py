@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.functions import Lower
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.utils import timezone
 from django.core.validators import MinLengthValidator
 from django.utils.translation import gettext_lazy as _
@@ -67,6 +69,11 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "username"
     REQUIRED_FIELDS = ["email", "birth_date"]
 
+    class Meta:
+        indexes = [
+            GinIndex(OpClass(Lower("username"), name="gin_trgm_ops"), name="user_username_trgm_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         if self.profile_pic:
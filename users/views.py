@@ -11,6 +11,8 @@ from django.contrib.auth import get_user_model
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes
 from django.db.models import Q, Exists, Value, BooleanField, Subquery, OuterRef
+from django.db.models.functions import Lower
+from title.search import search, is_fuzzy
 from .serializers import (
     UserSerializer, RegisterUserSerializer, MyTokenObtainPairSerializer, ChangePasswordSerializer,
     SendPasswordResetEmailSerializer, PasswordResetSerializer, UserMinSerializer, UserNotOwnerSerializer,
@@ -257,4 +259,6 @@ class UserSearchView(generics.ListAPIView):
     serializer_class = UserSearchSerializer
 
     def get_queryset(self):
-        return User.objects.filter(username__icontains=self.kwargs.get("username"))
+        return search(
+            User.objects.all(), self.kwargs.get("username"), document=Lower("username"), fuzzy=is_fuzzy(self.request.query_params)
+        )